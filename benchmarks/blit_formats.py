@@ -0,0 +1,42 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Measures blit throughput of the example assets as loaded from disk versus
+after scratchypy.image.normalize() has converted them to the display format.
+
+Run from this folder:  python blit_formats.py
+Set SDL_VIDEODRIVER to a real driver to measure with an actual window.
+"""
+import os
+import sys
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.append("..")
+import pygame
+from scratchypy import image
+
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "assets")
+SECONDS = 0.5
+
+def blits_per_second(screen, surface):
+    count = 0
+    end = time.perf_counter() + SECONDS
+    while time.perf_counter() < end:
+        for _ in range(10):
+            screen.blit(surface, (0, 0))
+        count += 10
+    return count / SECONDS
+
+def main():
+    pygame.display.init()
+    screen = pygame.display.set_mode((800, 600))
+    print("%-16s %12s %12s %8s" % ("asset", "raw/s", "normal/s", "speedup"))
+    for name in sorted(os.listdir(ASSETS)):
+        raw = pygame.image.load(os.path.join(ASSETS, name))
+        fast = image.normalize(raw)
+        rawRate = blits_per_second(screen, raw)
+        fastRate = blits_per_second(screen, fast)
+        print("%-16s %12.0f %12.0f %7.2fx" % (name, rawRate, fastRate, fastRate / rawRate))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Measures the time per frame of scrolling a stage camera across wider and
+wider worlds with the same density of sprites.  With culling it should stay
+about the same, since about the same number of sprites is in view.
+
+Run from this folder:  python camera.py
+"""
+import os
+import subprocess
+import sys
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.append("..")
+
+ASSET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "assets", "axolotl1.png")
+HEIGHT = 600
+PIXELS_PER_SPRITE = 5 # of world width; 20000 sprites is 100000 wide
+COUNTS = (1000, 5000, 20000)
+FRAMES = 100
+
+def run_one(count, pauseOffscreen):
+    """ Run in this process; print milliseconds per frame. """
+    import random
+    import pygame
+    from scratchypy import Sprite, get_window, get_stage, next_frame, start, image
+    stage = get_stage()
+    costume = image.load(ASSET)
+    rnd = random.Random(1)
+    world = pygame.Rect(0, 0, count * PIXELS_PER_SPRITE, HEIGHT)
+    for _ in range(count):
+        Sprite(costume, x=rnd.randrange(world.w), y=rnd.randrange(world.h), size=20, stage=stage)
+    stage.camera.world = world
+    stage.camera.pause_offscreen = pauseOffscreen
+
+    async def when_started(stage):
+        await next_frame()
+        begin = time.perf_counter()
+        for _ in range(FRAMES):
+            stage.camera.move_by(world.w / FRAMES, 0)
+            await next_frame()
+        print("%.3f" % ((time.perf_counter() - begin) * 1000 / FRAMES))
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    get_window().set_throttled(False)
+    stage.when_started(when_started)
+    start()
+
+def main():
+    print("%8s %8s %14s %14s" % ("sprites", "width", "ms/frame", "paused ticks"))
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    for count in COUNTS:
+        times = []
+        for paused in ("0", "1"):
+            # a fresh process each, since a window only runs once
+            out = subprocess.run([sys.executable, __file__, "--run", str(count), paused],
+                                 env=env, capture_output=True, text=True).stdout
+            times.append(out.strip().splitlines()[-1])
+        print("%8d %8d %14s %14s" % (count, count * PIXELS_PER_SPRITE, times[0], times[1]))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run_one(int(sys.argv[2]), sys.argv[3] == "1")
+    else:
+        main()
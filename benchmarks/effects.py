@@ -0,0 +1,46 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Measures the cost of each graphic effect at typical costume sizes, both the
+first time (computed) and repeated (cached).
+
+Run from this folder:  python effects.py
+"""
+import os
+import sys
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.append("..")
+import pygame
+from scratchypy import effects, image
+
+ASSET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "assets", "axolotl1.png")
+SIZES = (64, 128, 256)
+VALUES = { effects.COLOR: 50, effects.BRIGHTNESS: 30, effects.FISHEYE: 50,
+           effects.WHIRL: 90, effects.PIXELATE: 40, effects.MOSAIC: 20 }
+RUNS = 20
+
+def time_ms(func):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        func()
+    return (time.perf_counter() - start) * 1000 / RUNS
+
+def main():
+    pygame.display.init()
+    pygame.display.set_mode((800, 600))
+    original = image.load(ASSET)
+    print("%-12s %6s %12s %12s" % ("effect", "size", "computed ms", "cached ms"))
+    for size in SIZES:
+        costume = image.normalize(pygame.transform.smoothscale(original, (size, size)))
+        for effect, value in VALUES.items():
+            settings = { effect: value }
+            def computed():
+                effects._cache.clear()
+                effects._maps.clear()
+                effects.apply(costume, settings)
+            cached = lambda: effects.apply(costume, settings)
+            print("%-12s %6d %12.3f %12.4f" % (effect, size, time_ms(computed), time_ms(cached)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Measures how long it takes to import parts of ScratchyPy, using Python's
+`-X importtime` option in a fresh interpreter for each.
+
+Run from this folder:
+    python import_time.py           # print the current numbers
+    python import_time.py --save    # also record them for this version
+
+Saved results go in import_times.json, one entry per version, so startup
+cost can be compared across releases.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+HISTORY = os.path.join(HERE, "import_times.json")
+RUNS = 5
+# What to time: the statement run in a fresh interpreter
+TARGETS = {
+    "package": "import scratchypy",
+    "image": "import scratchypy.image",
+    "window": "import scratchypy.window",
+    "star": "from scratchypy import *",
+}
+
+def import_usec(statement):
+    """
+    @return the cumulative microseconds for the statement, excluding the
+            interpreter's own startup imports.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    baseline = _total(["-c", "pass"], env)
+    return _total(["-c", statement], env) - baseline
+
+def _total(args, env):
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args,
+                            env=env, capture_output=True, text=True)
+    total = 0
+    for line in result.stderr.splitlines():
+        # "import time: self | cumulative | name"; top level names are not indented
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)", line)
+        if m and not m.group(2).startswith(" "):
+            total += int(m.group(1))
+    return total
+
+def main():
+    sys.path.insert(0, ROOT)
+    from scratchypy.version import __version__
+    results = {}
+    for name, statement in TARGETS.items():
+        # best of several runs to reduce noise
+        results[name] = min(import_usec(statement) for _ in range(RUNS))
+        print("%-8s %8.1f ms   %s" % (name, results[name] / 1000, statement))
+
+    history = {}
+    if os.path.exists(HISTORY):
+        with open(HISTORY) as f:
+            history = json.load(f)
+    for version, old in sorted(history.items()):
+        if version != __version__:
+            print("vs %s: " % version + ", ".join(
+                "%s %+.1f ms" % (k, (results[k] - v) / 1000) for k, v in old.items() if k in results))
+    if "--save" in sys.argv:
+        history[__version__] = results
+        with open(HISTORY, "w") as f:
+            json.dump(history, f, indent=2, sort_keys=True)
+        print("Saved as version %s" % __version__)
+
+if __name__ == '__main__':
+    main()
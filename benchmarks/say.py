@@ -0,0 +1,49 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Measures how many Sprite.say() calls per second can be made, with fonts from
+the shared registry versus looking up the system font on every call (how
+say() used to work).
+
+Run from this folder:  python say.py
+"""
+import os
+import sys
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.append("..")
+import pygame
+from scratchypy import text
+from scratchypy.sprite import Sprite
+
+SECONDS = 1.0
+
+def says_per_second(sprite):
+    count = 0
+    end = time.perf_counter() + SECONDS
+    while time.perf_counter() < end:
+        sprite.say("Hello there number %d!" % count)
+        count += 1
+    return count / SECONDS
+
+def main():
+    pygame.display.init()
+    pygame.display.set_mode((800, 600))
+    costume = pygame.Surface((50, 50))
+    sprite = Sprite(costume)
+
+    registry = says_per_second(sprite)
+    # The old way: a system font lookup on every bubble
+    cachedFont = text.get_font
+    text.get_font = lambda family=text.DEFAULT_FONT, size=25, bold=False, italic=False: \
+        pygame.font.SysFont(family, size, bold, italic)
+    try:
+        lookup = says_per_second(sprite)
+    finally:
+        text.get_font = cachedFont
+    print("say() per second with SysFont each time: %8.0f" % lookup)
+    print("say() per second with the font registry: %8.0f" % registry)
+    print("speedup: %.2fx" % (registry / lookup))
+
+if __name__ == '__main__':
+    main()
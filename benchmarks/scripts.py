@@ -0,0 +1,62 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Measures the time per frame of many small 'forever' scripts, run by the
+scheduler versus as plain asyncio Tasks.
+
+Run from this folder:  python scripts.py [number of scripts]
+"""
+import os
+import subprocess
+import sys
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.append("..")
+
+SCRIPTS = 10000
+FRAMES = 100
+WARMUP = 10
+
+def run_one(mode, count):
+    """ Run in this process; print milliseconds per frame. """
+    import asyncio
+    import pygame
+    from scratchypy import get_window, get_stage, next_frame, start
+    counter = [0]
+    async def script():
+        while await next_frame():
+            counter[0] += 1
+
+    async def when_started(stage):
+        for _ in range(count):
+            if mode == "asyncio":
+                asyncio.create_task(script())
+            else:
+                stage.run(script())
+        for _ in range(WARMUP):
+            await next_frame()
+        begin = time.perf_counter()
+        for _ in range(FRAMES):
+            await next_frame()
+        print("%.3f" % ((time.perf_counter() - begin) * 1000 / FRAMES))
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    get_window().set_throttled(False)
+    get_stage().when_started(when_started)
+    start()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else SCRIPTS
+    print("%d scripts, ms per frame:" % count)
+    for mode in ("asyncio", "scheduler"):
+        # a fresh process each, since a window only runs once
+        env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+        out = subprocess.run([sys.executable, __file__, "--run", mode, str(count)],
+                             env=env, capture_output=True, text=True).stdout
+        print("%-10s %s" % (mode, out.strip().splitlines()[-1]))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run_one(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
@@ -36,7 +36,7 @@ async def init(stage):
     smallText = TextSprite("Small text", size=12, color=color.RED, topleft=(0,300))
     stage.add(smallText)
     
-    font = pygame.font.SysFont("serif", 40, italic=True)
+    font = text.get_font("serif", 40, italic=True)
     fontText = TextSprite("Different font", font=font, topleft=(0, 320))
     stage.add(fontText)
     
@@ -2,18 +2,40 @@
 # See LICENSE file for full license terms.
 """
 This is the documentation for the ScratchyPy library.  I suggest looking at
-the `sprite` and `stage` modules first! 
-""" 
-
-import pygame
+the `sprite` and `stage` modules first!
+"""
 
-pygame.init()
+# Submodules are imported on first use so that tools which only need e.g.
+# `scratchypy.image` don't pay for the whole library and pygame's subsystems
+# at import time.  `from scratchypy import *` still gets everything.
+import importlib
 
 from .version import __version__
-print("ScratchyPy " + __version__)
 
-from . import sprite, stage, window, color, sound, image, text
-from .window import *
-from .stage import *
-from .sprite import *
-from .util import *
+_SUBMODULES = ("sprite", "stage", "window", "color", "sound", "image", "text", "effects",
+               "replay", "diskcache", "tween", "scheduler", "animation", "camera",
+               "tilemap", "layer", "recorder", "golden", "bench", "vecstage", "util")
+# Modules whose public names are available directly from the package
+_STAR_MODULES = ("window", "stage", "sprite", "util")
+
+def _public_names(module):
+    return [n for n in vars(module) if not n.startswith('_')]
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module("." + name, __name__)
+    if name == "__all__":
+        # Asked for by 'import *'; load everything like a regular import would
+        names = list(_SUBMODULES)
+        for modName in _STAR_MODULES:
+            names.extend(_public_names(importlib.import_module("." + modName, __name__)))
+        globals()["__all__"] = names
+        return names
+    for modName in reversed(_STAR_MODULES): # later ones won in the old star imports
+        module = importlib.import_module("." + modName, __name__)
+        if hasattr(module, name) and not name.startswith('_'):
+            return getattr(module, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(__getattr__("__all__")))
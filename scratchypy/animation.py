@@ -0,0 +1,162 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Playback of costume animations, used by AnimatedSprite.
+
+Every stage has one AnimationClock that moves all its animations forward
+together once per frame.  Each frame of an animation has a duration in
+seconds, so any rate works, not only ones that divide the window's frame
+rate, and frames can have different lengths.  Time is counted in frames of
+the window, so animations stay in step with everything else when the window
+is not throttled or is replaying input.
+"""
+import asyncio
+
+LOOP = "loop"
+PING_PONG = "ping_pong"
+ONCE = "once"
+MODES = (LOOP, PING_PONG, ONCE)
+
+
+class Animation:
+    """
+    The playback state of one sprite's costumes.  It can be awaited until it
+    finishes, which is the end of a ONCE animation, or stop().
+    """
+    def __init__(self, sprite, fps:float=5, durations=None, mode:str=LOOP):
+        """
+        @param fps Frames per second, may be fractional.
+        @param durations Optional list of seconds for each frame, instead of
+               the same 1/fps for all.
+        @param mode LOOP, PING_PONG or ONCE.
+        """
+        self._sprite = sprite
+        self._frameSec = None
+        self._durations = None
+        self.set_rate(fps, durations)
+        self.set_mode(mode)
+        self._time = 0.0 # seconds into the current frame
+        self._step = 1 # or -1 going back in PING_PONG
+        self._playing = True
+        self._ended = False # by stop() or the end of ONCE; not by pause()
+        self._future = None # only made if someone awaits
+
+    def clone(self, sprite):
+        copy = Animation(sprite, mode=self._mode)
+        copy._frameSec = self._frameSec
+        copy._durations = self._durations
+        copy._time = self._time
+        copy._step = self._step
+        copy._playing = self._playing
+        copy._ended = self._ended
+        return copy
+
+    def set_rate(self, fps:float=None, durations=None):
+        if durations is not None:
+            if not durations or min(durations) <= 0:
+                raise ValueError("durations must be positive seconds")
+            self._durations = list(durations)
+        elif fps is None or fps <= 0:
+            raise ValueError("fps must be more than 0")
+        else:
+            self._durations = None
+            self._frameSec = 1 / fps
+
+    def set_mode(self, mode:str):
+        if mode not in MODES:
+            raise ValueError("mode must be one of " + ", ".join(MODES))
+        self._mode = mode
+
+    @property
+    def playing(self) -> bool:
+        return self._playing
+
+    def play(self):
+        if not self._playing:
+            self._playing = True
+            self._ended = False
+            if self._future is not None and self._future.done():
+                self._future = None # a new run; anyone waiting stays waiting
+
+    def restart(self):
+        """ Play from the first frame. """
+        self._time = 0.0
+        self._step = 1
+        self.play()
+
+    def pause(self):
+        self._playing = False
+
+    def stop(self):
+        self._playing = False
+        self._finish()
+
+    def _duration(self, index):
+        durations = self._durations
+        return durations[index % len(durations)] if durations else self._frameSec
+
+    def _advance(self, dt):
+        """
+        @return the new frame index if it changed, else None
+        """
+        self._time += dt
+        start = index = self._sprite._costumeIndex
+        count = len(self._sprite._costumes)
+        duration = self._duration(index)
+        while self._time >= duration:
+            self._time -= duration
+            following = index + self._step
+            if not 0 <= following < count:
+                if self._mode == LOOP:
+                    following %= count
+                elif self._mode == PING_PONG:
+                    self._step = -self._step
+                    following = min(max(index + self._step, 0), count - 1)
+                else: # ONCE: stay on the last frame
+                    self._time = 0.0
+                    self._playing = False
+                    self._finish()
+                    break
+            index = following
+            duration = self._duration(index)
+        return index if index != start else None
+
+    def _finish(self):
+        self._ended = True
+        if self._future is not None and not self._future.done():
+            self._future.set_result(None)
+
+    def __await__(self):
+        if self._ended:
+            return None
+        # waits through pause() and play() until the end
+        if self._future is None or self._future.done():
+            self._future = asyncio.get_running_loop().create_future()
+        return (yield from self._future.__await__())
+
+
+class AnimationClock:
+    """
+    Advances all the animations of a stage, once per frame.
+    """
+    def __init__(self):
+        self._animations = {} # used as an ordered set
+
+    def __len__(self):
+        return len(self._animations)
+
+    def add(self, animation:Animation):
+        self._animations[animation] = None
+
+    def discard(self, animation:Animation):
+        self._animations.pop(animation, None)
+
+    def clear(self):
+        self._animations.clear()
+
+    def step(self, dt:float):
+        for anim in self._animations:
+            if anim._playing:
+                index = anim._advance(dt)
+                if index is not None:
+                    anim._sprite._show_frame(index)
@@ -0,0 +1,348 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Performance benchmarks of common kinds of programs, to measure each release
+and catch slowdowns:
+```
+python -m scratchypy.bench --save baseline.json       # before a change
+python -m scratchypy.bench --baseline baseline.json   # after it
+```
+Each scenario runs in its own process with no window, drawing frames as
+fast as it can with a fixed timestep.  For each one it reports:
+* frame time percentiles in milliseconds, from frames after a warm up
+* callbacks per second: how many sprite and stage handlers ran
+* peak memory of the process in megabytes, where the OS reports it
+
+With --baseline, a scenario whose median or 90th percentile frame time is
+slower than the baseline by more than the threshold is a regression, and
+the exit code is 1.  Comparing is only meaningful on the same machine.
+
+See list_scenarios(), or --list, for what each scenario does.  The
+benchmarks folder has more focused benchmarks of single changes.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import pygame
+
+COUNT = 200 # sprites, or other things, in each scenario
+FRAMES = 120
+WARMUP = 10
+THRESHOLD = 0.10 # 10% slower
+
+COSTUME_SIZE = (370, 340) # like the mascot's costume in the examples
+_SCENARIOS = {} # name -> (setup function, description)
+_calls = 0
+
+
+def scenario(description:str):
+    """ Decorator to add a setup function as a scenario, by its name """
+    def register(setup):
+        _SCENARIOS[setup.__name__] = (setup, description)
+        return setup
+    return register
+
+def list_scenarios() -> dict:
+    """ @return {name: description} of all the scenarios """
+    return { name:description for name, (_, description) in _SCENARIOS.items() }
+
+def _counted(handler):
+    """ Wrap a handler so its calls count towards callbacks per second """
+    def counter(*args):
+        global _calls
+        _calls += 1
+        handler(*args)
+    counter.__name__ = handler.__name__
+    return counter
+
+def _costume():
+    """
+    @return a costume drawn here, not loaded, since the examples' assets
+            aren't installed with the package.  A round shape with holes
+            has transparent edges and a mask that isn't a box, like a
+            real one.
+    """
+    surface = pygame.Surface(COSTUME_SIZE, pygame.SRCALPHA)
+    surface.fill((0, 0, 0, 0))
+    w, h = COSTUME_SIZE
+    pygame.draw.ellipse(surface, (240, 150, 180, 255), (0, h // 4, w, h // 2))
+    pygame.draw.circle(surface, (240, 150, 180, 255), (w * 3 // 4, h // 2), h // 3)
+    for eye in (w * 2 // 3, w * 5 // 6):
+        pygame.draw.circle(surface, (0, 0, 0, 0), (eye, h // 2 - h // 8), h // 20)
+    return surface
+
+def _area():
+    from scratchypy import get_window
+    return get_window().rect
+
+def _scatter(stage, count, size=20, **kwargs):
+    from scratchypy import Sprite
+    costume = _costume()
+    rect = _area()
+    return [ Sprite(costume, x=random.randrange(rect.w), y=random.randrange(rect.h),
+                    size=size, stage=stage, **kwargs) for _ in range(count) ]
+
+@scenario("sprites that do nothing")
+def static(stage, count):
+    _scatter(stage, count)
+
+@scenario("sprites that do nothing, in a Layer drawn only when it changes")
+def static_layer(stage, count):
+    from scratchypy.layer import Layer
+    _scatter(stage.add_layer(Layer(), below=True), count)
+
+@scenario("sprites that do nothing, set static to be drawn from a cached image")
+def static_baked(stage, count):
+    for sprite in _scatter(stage, count):
+        sprite.set_static()
+
+@scenario("sprites turning every frame, which rotates their costume")
+def rotating(stage, count):
+    def turn(sprite):
+        sprite.turn(7)
+    for sprite in _scatter(stage, count):
+        sprite.forever(_counted(turn))
+
+@scenario("sprites gliding to a new place whenever they get there")
+def gliding(stage, count):
+    rect = _area()
+    async def glide(sprite):
+        global _calls
+        while True:
+            _calls += 1
+            await sprite.glide_to(random.randrange(rect.w), random.randrange(rect.h), 0.5)
+    for sprite in _scatter(stage, count):
+        sprite.run(glide(sprite))
+
+@scenario("moving sprites each checking if they touch a big sprite, with masks")
+def collisions(stage, count):
+    from scratchypy import Sprite
+    rect = _area()
+    target = Sprite(_costume(), x=rect.centerx, y=rect.centery, size=150, stage=stage)
+    def check(sprite):
+        sprite.move(3)
+        sprite.if_on_edge_bounce()
+        if sprite.touching(target):
+            sprite.turn(45)
+    for sprite in _scatter(stage, count, size=30):
+        sprite.point_in_direction(random.randrange(360))
+        sprite.forever(_counted(check))
+
+@scenario("text sprites changing their text every frame")
+def text_churn(stage, count):
+    from scratchypy import TextSprite
+    rect = _area()
+    def change(sprite):
+        sprite.set_text("Score: %d" % random.randrange(100000))
+    for _ in range(count // 4):
+        sprite = TextSprite("Score: 0", size=20, x=random.randrange(rect.w), y=random.randrange(rect.h), stage=stage)
+        sprite.forever(_counted(change))
+
+@scenario("sprites saying something new every frame")
+def say_churn(stage, count):
+    def speak(sprite):
+        sprite.say("I am at %d, %d" % (sprite.x_position, sprite.y_position))
+        sprite.move(1)
+    for sprite in _scatter(stage, count // 4):
+        sprite.forever(_counted(speak))
+
+@scenario("a broadcast every frame, received by every sprite")
+def broadcast(stage, count):
+    def receive(sprite, args):
+        sprite.change_x_by(args["dx"])
+    for sprite in _scatter(stage, count):
+        sprite.when_i_receive("wiggle", _counted(receive))
+    frame = 0
+    def send(stage):
+        nonlocal frame
+        frame += 1
+        stage.broadcast("wiggle", {"dx": 1 if frame % 2 else -1})
+    stage.forever(_counted(send))
+
+@scenario("switching between backdrops every frame, with some sprites")
+def backdrops(stage, count):
+    rect = _area()
+    for i in range(8):
+        surface = pygame.Surface(rect.size)
+        surface.fill((30 * i, 100, 255 - 30 * i))
+        stage.add_backdrop(surface, "backdrop%d" % i)
+    _scatter(stage, count // 4)
+    stage.forever(_counted(lambda stage: stage.next_backdrop()))
+
+def _percentile(ordered, percent):
+    return ordered[min(len(ordered) - 1, int(math.ceil(percent / 100 * len(ordered))) - 1)]
+
+def _peak_megabytes():
+    try:
+        # Linux; ru_maxrss there can be the parent's from before exec
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_scenario(name:str, count:int=COUNT, frames:int=FRAMES, seed:int=0) -> dict:
+    """
+    Run a scenario in this process.  A window can only run once per process.
+    @return the results as a dictionary
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    from scratchypy import get_window, get_stage, next_frame, start
+    random.seed(seed)
+    window = get_window()
+    window.set_fixed_timestep(True)
+    setup = _SCENARIOS[name][0]
+    times = []
+    callSeconds = []
+
+    async def measure(stage):
+        global _calls
+        setup(stage, count)
+        for _ in range(WARMUP):
+            await next_frame()
+        _calls = 0
+        begin = last = time.perf_counter()
+        for _ in range(frames):
+            await next_frame()
+            now = time.perf_counter()
+            times.append(now - last)
+            last = now
+        callSeconds.append(_calls / (last - begin))
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    get_stage().when_started(measure)
+    try:
+        start()
+    except SystemExit:
+        pass
+    ordered = sorted(times)
+    ms = lambda sec: round(sec * 1000, 3)
+    return {
+        "count": count,
+        "frames": len(times),
+        "mean_ms": ms(sum(times) / len(times)),
+        "p50_ms": ms(_percentile(ordered, 50)),
+        "p90_ms": ms(_percentile(ordered, 90)),
+        "p99_ms": ms(_percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]),
+        "callbacks_per_sec": round(callSeconds[0]),
+        "peak_mb": _peak_megabytes(),
+    }
+
+def run(names=None, count:int=COUNT, frames:int=FRAMES, seed:int=0) -> dict:
+    """
+    Run scenarios, each in a new process.
+    @param names Scenario names, or None for all.
+    @return the report: {"system": {...}, "scenarios": {name: results}}
+    """
+    from scratchypy.version import __version__
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    results = {}
+    for name in names or _SCENARIOS:
+        if name not in _SCENARIOS:
+            raise KeyError("No scenario named %s; try --list" % name)
+        out = subprocess.run([sys.executable, "-m", "scratchypy.bench", "--run", name,
+                              str(count), str(frames), str(seed)],
+                             env=env, capture_output=True, text=True)
+        lines = out.stdout.strip().splitlines()
+        if out.returncode or not lines or not lines[-1].startswith("{"):
+            raise RuntimeError("Scenario %s failed:\n%s" % (name, out.stderr.strip()))
+        if "Callback error" in out.stdout:
+            # it would measure printing tracebacks instead
+            raise RuntimeError("Scenario %s had errors in callbacks:\n%s" % (name, out.stderr.strip()[-2000:]))
+        results[name] = json.loads(lines[-1])
+    return {
+        "system": {
+            "scratchypy": __version__,
+            "pygame": pygame.version.ver,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "scenarios": results,
+    }
+
+def compare(report:dict, baseline:dict, threshold:float=THRESHOLD) -> list:
+    """
+    @return a list of (scenario, measure, baseline value, new value) for the
+            frame times more than threshold (a fraction) slower.
+    """
+    regressions = []
+    for name, results in report["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None or old["count"] != results["count"]:
+            continue
+        for measure in ("p50_ms", "p90_ms"):
+            if results[measure] > old[measure] * (1 + threshold):
+                regressions.append((name, measure, old[measure], results[measure]))
+    return regressions
+
+def _print_table(report, baseline):
+    print("%-12s %8s %8s %8s %8s %12s %8s" % ("scenario", "p50 ms", "p90 ms", "p99 ms",
+                                             "max ms", "calls/s", "peak MB"))
+    for name, r in report["scenarios"].items():
+        print("%-12s %8.2f %8.2f %8.2f %8.2f %12d %8s" % (name, r["p50_ms"], r["p90_ms"], r["p99_ms"],
+                                                         r["max_ms"], r["callbacks_per_sec"], r["peak_mb"]))
+        old = baseline["scenarios"].get(name) if baseline else None
+        if old:
+            print("%-12s %+7.0f%% %+7.0f%%" % ("  vs base", 100 * (r["p50_ms"] / old["p50_ms"] - 1),
+                                              100 * (r["p90_ms"] / old["p90_ms"] - 1)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scratchypy.bench",
+                                     description="Measure frame times of typical programs.")
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run, default all")
+    parser.add_argument("--list", action="store_true", help="list the scenarios and exit")
+    parser.add_argument("--count", type=int, default=COUNT, help="sprites per scenario, default %(default)s")
+    parser.add_argument("--frames", type=int, default=FRAMES, help="frames measured, default %(default)s")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random module")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare with results saved before")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="fraction slower that is a regression, default %(default)s")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+    if args.list:
+        for name, description in list_scenarios().items():
+            print("%-12s %s" % (name, description))
+        return 0
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report = run(args.scenarios, args.count, args.frames, args.seed)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_table(report, baseline)
+    if baseline:
+        regressions = compare(report, baseline, args.threshold)
+        for name, measure, old, new in regressions:
+            print("REGRESSION %s %s: %.2f -> %.2f ms" % (name, measure, old, new))
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        print(json.dumps(run_scenario(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5]))))
+    else:
+        sys.exit(main())
@@ -0,0 +1,167 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+A Camera lets a stage be a world bigger than the window.  Sprites keep their
+positions in world coordinates and the camera decides which part of the
+world is shown:
+```
+stage.camera.world = pygame.Rect(0, 0, 100000, 600)
+stage.camera.follow(player)
+```
+Only the sprites in view are drawn, found from a grid of where every sprite
+is, so the cost of a frame depends on what is visible rather than on the
+size of the world.  With `pause_offscreen` set, sprites out of view also skip
+their tick handlers.
+
+The backdrop stays still behind the world.  The pen layer is the size of the
+window, at the world's origin.
+"""
+import pygame
+
+
+class SpatialGrid:
+    """
+    Which sprites overlap each cell of a grid over the world, kept up to
+    date as they move, to find the sprites in an area without looking at
+    every one.
+    """
+    CELL = 256
+
+    def __init__(self, cellSize:int=CELL):
+        self._cellSize = cellSize
+        self._cells = {} # (cx, cy) -> set of sprites
+
+    def _span(self, rect):
+        size = self._cellSize
+        return (rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def move(self, sprite):
+        """ Update where the sprite is, after its rect changed. """
+        span = self._span(sprite._rect)
+        old = sprite._gridSpan
+        if span == old:
+            return
+        if old is not None:
+            self._discard(sprite, old)
+        cells = self._cells
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    cells[(cx, cy)] = {sprite}
+                else:
+                    cell.add(sprite)
+        sprite._gridSpan = span
+
+    def remove(self, sprite):
+        if sprite._gridSpan is not None:
+            self._discard(sprite, sprite._gridSpan)
+            sprite._gridSpan = None
+
+    def _discard(self, sprite, span):
+        cells = self._cells
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell is not None:
+                    cell.discard(sprite)
+                    if not cell:
+                        del cells[(cx, cy)]
+
+    def query(self, rect) -> set:
+        """ @return the sprites in the cells the rect touches """
+        found = set()
+        cells = self._cells
+        x0, y0, x1, y1 = self._span(rect)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    found |= cell
+        return found
+
+
+class Camera:
+    """
+    The view of a stage's world shown in the window.  Get it from
+    `stage.camera`.
+    """
+    def __init__(self, size):
+        """
+        @param size The (w, h) of the view, normally the window size.
+        """
+        self._x = 0
+        self._y = 0
+        self._size = size
+        self._world = None
+        self._following = None
+        self.pause_offscreen = False
+
+    @property
+    def x(self) -> float:
+        """ World x of the left of the view """
+        return self._x
+
+    @property
+    def y(self) -> float:
+        """ World y of the top of the view """
+        return self._y
+
+    @property
+    def view(self) -> pygame.Rect:
+        """ The part of the world that is shown, in world coordinates """
+        return pygame.Rect(int(self._x), int(self._y), *self._size)
+
+    @property
+    def world(self):
+        """
+        The bounds of the world as a pygame.Rect, or None for no limit.
+        The camera stays inside it, and sprite edges are its edges.
+        """
+        return self._world
+
+    @world.setter
+    def world(self, rect):
+        self._world = pygame.Rect(rect) if rect is not None else None
+        self.go_to(self._x, self._y)
+
+    def go_to(self, x:float, y:float):
+        """ Show the world from (x, y) at the top left of the window. """
+        if self._world is not None:
+            x = min(max(x, self._world.left), self._world.right - self._size[0])
+            y = min(max(y, self._world.top), self._world.bottom - self._size[1])
+        self._x = x
+        self._y = y
+
+    def move_by(self, dx:float, dy:float):
+        self.go_to(self._x + dx, self._y + dy)
+
+    def center_on(self, x:float, y:float):
+        self.go_to(x - self._size[0] / 2, y - self._size[1] / 2)
+
+    def follow(self, sprite):
+        """
+        Keep the sprite in the middle of the view each frame, or None to
+        stop following.
+        """
+        self._following = sprite
+
+    def to_screen(self, position):
+        """ @return the window (x, y) of a world position """
+        return (position[0] - self._x, position[1] - self._y)
+
+    def to_world(self, position):
+        """ @return the world (x, y) of a window position, e.g. the mouse """
+        return (position[0] + self._x, position[1] + self._y)
+
+    def _update(self, size):
+        self._size = size
+        if self._following is not None:
+            self.center_on(self._following._x, self._following._y)
+
+    @property
+    def _offset(self):
+        """ The (dx, dy) to move world rects to the screen """
+        return (-int(self._x), -int(self._y))
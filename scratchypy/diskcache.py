@@ -0,0 +1,210 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Optional on-disk cache of decoded images, transformed costumes and their
+collision masks, to make the next start of a big project faster.
+
+It is off until enable() is called, before making any sprites:
+```
+from scratchypy import diskcache
+diskcache.enable(".scratchycache")
+```
+Entries are keyed by a hash of the image file's contents plus the transform
+(flip, rotation, scale), so editing an image simply makes new entries.  Old
+ones are removed, least recently used first, when the cache grows past its
+size limit.
+
+Each entry is one small file holding raw pixels and raw mask bits, which load
+with a memory copy instead of PNG/JPG decoding, rotating, smoothscaling and
+mask building.
+"""
+import hashlib
+import os
+import struct
+import threading
+import pygame
+import pygame.image
+import pygame.mask
+from scratchypy import image
+from scratchypy.util import synchronized
+
+_MAGIC = b"SPYC"
+_VERSION = 1
+# magic, version, width, height, flags, colorkey RGBA
+_HEADER = struct.Struct("<4sHIIB4B")
+_ALPHA = 1
+_COLORKEY = 2
+_MASK = 4
+_SUFFIX = ".spyc"
+
+_dir = None
+_maxBytes = 0
+_totalBytes = 0
+# abspath -> (mtime_ns, size, hash) so files are only hashed once
+_fileHashes = {}
+# Guards the above and the files; stages can be made on another thread
+_lock = threading.RLock()
+
+@synchronized(_lock)
+def enable(directory:str, maxMegabytes:float=256):
+    """
+    Turn on the disk cache.
+    @param directory Where to keep the cache files.  Made if needed.
+    @param maxMegabytes The size limit; least recently used entries are
+           deleted to stay under it.
+    """
+    global _dir, _maxBytes, _totalBytes
+    os.makedirs(directory, exist_ok=True)
+    _dir = directory
+    _maxBytes = int(maxMegabytes * 1024 * 1024)
+    _totalBytes = sum(e.stat().st_size for e in _entries())
+    _trim()
+
+def disable():
+    """ Turn off the disk cache.  The files are left in place. """
+    global _dir
+    _dir = None
+
+def enabled() -> bool:
+    return _dir is not None
+
+@synchronized(_lock)
+def clear():
+    """ Delete every entry in the cache. """
+    global _totalBytes
+    for e in _entries():
+        os.remove(e.path)
+    _totalBytes = 0
+
+@synchronized(_lock)
+def file_key(path:str) -> str:
+    """
+    @return a hash of the file's contents.  It is only recomputed when the
+            file's size or modification time changes.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    known = _fileHashes.get(path)
+    if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+        return known[2]
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _fileHashes[path] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+def make_key(*parts) -> str:
+    """
+    @return a cache key from a source key plus any transform parameters.
+    """
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def transform_key(surface:pygame.Surface, flip:bool, angle:float, scale:float):
+    """
+    @return the key for a costume transformed by the given parameters, or None
+            if it didn't come from a file and can't be cached.
+    """
+    source = image.source_key(surface)
+    if source is None:
+        return None
+    return make_key("costume", source, flip, round(angle, 4), round(scale, 6))
+
+@synchronized(_lock)
+def load(key:str):
+    """
+    @return a (surface, mask) tuple, or None if the entry isn't cached.
+            The mask is None if none was stored.
+    """
+    if _dir is None or key is None:
+        return None
+    path = os.path.join(_dir, key + _SUFFIX)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path) # most recently used
+    except OSError:
+        return None
+    try:
+        magic, version, w, h, flags, *ck = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("not a cache entry of this version")
+        fmt = "RGBA" if flags & _ALPHA else "RGB"
+        start = _HEADER.size
+        end = start + w * h * len(fmt)
+        surface = pygame.image.frombytes(data[start:end], (w, h), fmt)
+        if flags & _COLORKEY:
+            surface.set_colorkey(ck, pygame.RLEACCEL)
+        mask = None
+        if flags & _MASK:
+            mask = pygame.mask.Mask((w, h))
+            memoryview(mask).cast('B')[:] = data[end:]
+    except (ValueError, struct.error):
+        # truncated or partly written; a miss, and make room for a good one
+        _remove(path, len(data))
+        return None
+    return (image.normalize(surface), mask)
+
+@synchronized(_lock)
+def store(key:str, surface:pygame.Surface, mask:pygame.mask.Mask=None):
+    """
+    Save a surface and optional mask under the key.  Errors are ignored
+    since the cache is only an optimization.
+    """
+    global _totalBytes
+    if _dir is None or key is None:
+        return
+    alpha = surface.get_flags() & pygame.SRCALPHA
+    colorkey = surface.get_colorkey()
+    flags = (_ALPHA if alpha else 0) | (_COLORKEY if colorkey else 0) | (_MASK if mask is not None else 0)
+    w, h = surface.get_size()
+    header = _HEADER.pack(_MAGIC, _VERSION, w, h, flags, *(colorkey or (0,0,0,0)))
+    pixels = pygame.image.tobytes(surface, "RGBA" if alpha else "RGB")
+    bits = memoryview(mask).tobytes() if mask is not None else b""
+    path = os.path.join(_dir, key + _SUFFIX)
+    tmp = path + ".tmp"
+    try:
+        oldSize = os.path.getsize(path) # replaced, so not counted twice
+    except OSError:
+        oldSize = 0
+    try:
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.write(pixels)
+            f.write(bits)
+        os.replace(tmp, path)
+    except OSError as ex:
+        print("Disk cache write failed: %s" % ex)
+        return
+    _totalBytes += len(header) + len(pixels) + len(bits) - oldSize
+    if _totalBytes > _maxBytes:
+        _trim()
+
+def _remove(path:str, size:int):
+    global _totalBytes
+    try:
+        os.remove(path)
+        _totalBytes -= size
+    except OSError:
+        pass
+
+def _entries():
+    return [e for e in os.scandir(_dir) if e.name.endswith(_SUFFIX)]
+
+def _trim():
+    "Delete least recently used entries down to 90% of the limit."
+    global _totalBytes
+    if _totalBytes <= _maxBytes:
+        return
+    entries = sorted(_entries(), key=lambda e: e.stat().st_mtime_ns)
+    target = _maxBytes * 9 // 10
+    for e in entries:
+        if _totalBytes <= target:
+            break
+        try:
+            size = e.stat().st_size
+            os.remove(e.path)
+            _totalBytes -= size
+        except OSError:
+            pass
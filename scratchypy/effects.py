@@ -0,0 +1,236 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Graphic effects like the Scratch "set effect" blocks: color, fisheye, whirl,
+pixelate, mosaic, brightness and ghost.  Use them through the Sprite methods
+set_effect_to(), change_effect_by() and clear_graphic_effects().
+
+Effects are applied to the costume before it is rotated and scaled, and the
+results are cached per costume, so showing the same effect again is free.
+Ghost is not applied to the pixels at all; it is the whole surface's alpha.
+
+The color, fisheye and whirl effects need NumPy.  Without it they are
+ignored, with a warning the first time.
+"""
+import collections
+import math
+import threading
+import weakref
+import pygame
+import pygame.transform
+from scratchypy import image
+from scratchypy.util import synchronized
+
+try:
+    import numpy
+    import pygame.surfarray
+except ImportError:
+    numpy = None
+
+COLOR = "color"
+FISHEYE = "fisheye"
+WHIRL = "whirl"
+PIXELATE = "pixelate"
+MOSAIC = "mosaic"
+BRIGHTNESS = "brightness"
+GHOST = "ghost"
+ALL_EFFECTS = (COLOR, FISHEYE, WHIRL, PIXELATE, MOSAIC, BRIGHTNESS, GHOST)
+# Applied in this order, like Scratch's shader
+_IMAGE_EFFECTS = (COLOR, BRIGHTNESS, FISHEYE, WHIRL, PIXELATE, MOSAIC)
+_NEEDS_NUMPY = (COLOR, FISHEYE, WHIRL)
+
+# Results kept per costume: costume -> OrderedDict(key -> surface)
+CACHE_PER_COSTUME = 8
+_cache = weakref.WeakKeyDictionary()
+# Coordinate maps for fisheye and whirl: (effect, value, w, h) -> (xs, ys)
+_MAX_MAPS = 16
+_maps = collections.OrderedDict()
+_warned = False
+# Guards the caches; stages can be made on another thread
+_lock = threading.RLock()
+
+
+def check_name(effect:str) -> str:
+    """ @return the effect name in lower case, or raise ValueError. """
+    name = effect.lower()
+    if name not in ALL_EFFECTS:
+        raise ValueError("Unknown effect '%s'; use one of %s" % (effect, ", ".join(ALL_EFFECTS)))
+    return name
+
+def clamp(effect:str, value:float) -> float:
+    """ Limit the value to the range Scratch allows for the effect. """
+    if effect == GHOST:
+        return min(max(value, 0), 100)
+    if effect == BRIGHTNESS:
+        return min(max(value, -100), 100)
+    if effect == COLOR:
+        return value % 200
+    return value
+
+def ghost_alpha(effects:dict):
+    """
+    @return the surface alpha 0..255 for the ghost effect, or None if there
+            is none.
+    """
+    ghost = effects.get(GHOST, 0)
+    return int(round(255 * (1 - ghost / 100))) if ghost else None
+
+def image_key(effects:dict):
+    """
+    @return a hashable key of the effects that change pixels, or None if
+            there are none (ghost doesn't count).
+    """
+    key = tuple((e, effects[e]) for e in _IMAGE_EFFECTS if effects.get(e))
+    return key if key else None
+
+@synchronized(_lock)
+def apply(costume:pygame.Surface, effects:dict) -> pygame.Surface:
+    """
+    @return the costume with the effects applied, which is the costume itself
+            if there are no pixel-changing effects.  Results are cached.
+    """
+    key = image_key(effects)
+    if key is None:
+        return costume
+    perCostume = _cache.get(costume)
+    if perCostume is None:
+        perCostume = _cache[costume] = collections.OrderedDict()
+    result = perCostume.get(key)
+    if result is not None:
+        perCostume.move_to_end(key)
+        return result
+
+    # Work on a per-pixel alpha copy so color keyed pixels stay transparent
+    result = pygame.Surface(costume.get_size(), pygame.SRCALPHA)
+    result.fill((0,0,0,0))
+    result.blit(costume, (0,0))
+    for effect, value in key:
+        if effect in _NEEDS_NUMPY and numpy is None:
+            _warn_numpy()
+            continue
+        result = _EFFECT_FUNCS[effect](result, value)
+
+    result = image.normalize(result)
+    perCostume[key] = result
+    while len(perCostume) > CACHE_PER_COSTUME:
+        perCostume.popitem(last=False)
+    return result
+
+def _warn_numpy():
+    global _warned
+    if not _warned:
+        _warned = True
+        print("The color, fisheye and whirl effects need numpy: pip install numpy")
+
+
+def _brightness(surface, value):
+    amount = int(round(abs(value) * 255 / 100))
+    flag = pygame.BLEND_RGB_ADD if value > 0 else pygame.BLEND_RGB_SUB
+    surface.fill((amount, amount, amount), special_flags=flag)
+    return surface
+
+def _pixelate(surface, value):
+    block = abs(value) / 10
+    if block < 2:
+        return surface
+    w, h = surface.get_size()
+    small = pygame.transform.scale(surface, (max(1, int(w / block)), max(1, int(h / block))))
+    return pygame.transform.scale(small, (w, h))
+
+def _mosaic(surface, value):
+    n = min(max(int(round((abs(value) + 10) / 10)), 1), 64)
+    if n == 1:
+        return surface
+    w, h = surface.get_size()
+    tile = pygame.transform.smoothscale(surface, (max(1, w // n), max(1, h // n)))
+    result = pygame.Surface((w, h), pygame.SRCALPHA)
+    result.fill((0,0,0,0))
+    tw, th = tile.get_size()
+    result.blits([(tile, (x, y)) for x in range(0, w, tw) for y in range(0, h, th)], doreturn=False)
+    return result
+
+def _color(surface, value):
+    """ Shift the hue by value/200 of the color wheel, like Scratch """
+    rgb = pygame.surfarray.pixels3d(surface)
+    c = rgb.astype(numpy.float32) / 255
+    r, g, b = c[..., 0], c[..., 1], c[..., 2]
+    maxc = c.max(axis=2)
+    minc = c.min(axis=2)
+    delta = maxc - minc
+    safe = numpy.where(delta == 0, 1, delta)
+    # hue in 0..6
+    hue = numpy.where(maxc == r, (g - b) / safe % 6,
+          numpy.where(maxc == g, (b - r) / safe + 2, (r - g) / safe + 4))
+    hue = (hue + value / 200 * 6) % 6
+    # back to RGB with the same value and saturation
+    i = numpy.floor(hue).astype(numpy.int8)
+    f = hue - i
+    p = minc
+    q = maxc - delta * f
+    t = minc + delta * f
+    choices = [(maxc, t, p), (q, maxc, p), (p, maxc, t),
+               (p, q, maxc), (t, p, maxc), (maxc, p, q)]
+    for channel in range(3):
+        rgb[..., channel] = numpy.select([i == k for k in range(6)],
+                                         [ch[channel] for ch in choices]) * 255
+    del rgb # unlock surface
+    return surface
+
+def _remap(surface, effect, value, mapFunc):
+    """
+    Move pixels by a coordinate mapping, cached per size and value.
+    mapFunc takes (dx, dy, dist) centered coordinates in -0.5..0.5 and
+    returns source coordinates in the same range.
+    """
+    w, h = surface.get_size()
+    mapKey = (effect, value, w, h)
+    maps = _maps.get(mapKey)
+    if maps is None:
+        xs, ys = numpy.indices((w, h), dtype=numpy.float32)
+        dx = (xs + 0.5) / w - 0.5
+        dy = (ys + 0.5) / h - 0.5
+        sx, sy = mapFunc(dx, dy, numpy.hypot(dx, dy))
+        maps = (numpy.clip(((sx + 0.5) * w).astype(numpy.intp), 0, w - 1),
+                numpy.clip(((sy + 0.5) * h).astype(numpy.intp), 0, h - 1))
+        _maps[mapKey] = maps
+        while len(_maps) > _MAX_MAPS:
+            _maps.popitem(last=False)
+    else:
+        _maps.move_to_end(mapKey)
+    mx, my = maps
+    result = pygame.Surface((w, h), pygame.SRCALPHA)
+    src = pygame.surfarray.pixels3d(surface)
+    srcAlpha = pygame.surfarray.pixels_alpha(surface)
+    out = pygame.surfarray.pixels3d(result)
+    outAlpha = pygame.surfarray.pixels_alpha(result)
+    out[...] = src[mx, my]
+    outAlpha[...] = srcAlpha[mx, my]
+    del src, srcAlpha, out, outAlpha # unlock surfaces
+    return result
+
+def _fisheye(surface, value):
+    power = max(0, (value + 100) / 100)
+    def mapFunc(dx, dy, dist):
+        # like Scratch: r' = r^power, inside the circle only
+        scale = numpy.where((dist > 0) & (dist < 0.5),
+                            numpy.power(dist * 2, power) / 2 / numpy.maximum(dist, 1e-6), 1)
+        return dx * scale, dy * scale
+    return _remap(surface, FISHEYE, value, mapFunc)
+
+def _whirl(surface, value):
+    radians = -value * math.pi / 180
+    def mapFunc(dx, dy, dist):
+        factor = numpy.maximum(1 - dist / 0.5, 0)
+        angle = radians * factor * factor
+        s, c = numpy.sin(angle), numpy.cos(angle)
+        return c * dx - s * dy, s * dx + c * dy
+    return _remap(surface, WHIRL, value, mapFunc)
+
+_EFFECT_FUNCS = {
+    COLOR: _color,
+    BRIGHTNESS: _brightness,
+    FISHEYE: _fisheye,
+    WHIRL: _whirl,
+    PIXELATE: _pixelate,
+    MOSAIC: _mosaic,
+}
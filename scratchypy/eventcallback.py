@@ -8,13 +8,14 @@ types of callback strategies.
 import asyncio
 import traceback
 from scratchypy.util import is_ui_thread
+from scratchypy import scheduler
 
 class EventCallback:
     '''
     Encapsulates a callback and the calling of it.
     It handles these cases:
     * callback is None; do nothing
-    * callback is async; create a task for it and run it on the event loop
+    * callback is async; run it as a script on the scheduler
     * callback is a regular function; call it synchronously on the next loop
     * caller has annotated with @to_thread; call it on threadpool
     Exceptions from the user callback are caught and logged.
@@ -92,12 +93,14 @@ class EventCallback:
         
     def _call_async(self, *args):
         """
-        Call an 'async' callback as an asyncio task.  Returns immediately after the task is scheduled.
+        Call an 'async' callback as a script.  Returns immediately after it is scheduled.
         """
         if self._task:
             print("Async callback '%s' still in progress, canceling" % self._name)
             self._task.cancel()
-        self._task = asyncio.create_task(self._safe_call_async(*args), name=self._name)
+        # scripts of a sprite belong to its stage, to pause with it
+        owner = getattr(self._obj, "_stage", self._obj)
+        self._task = scheduler.spawn(self._safe_call_async(*args), name=self._name, owner=owner)
         
     def _call_threaded(self, *args):
         """
@@ -0,0 +1,183 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Golden image checks: run a program for some frames and compare what it
+drew with saved "golden" PNG images, to catch drawing changes by mistake.
+
+Run from the command line.  The first time, or after a change on purpose,
+save new golden images:
+```
+python -m scratchypy.golden --update examples/*.py
+```
+Then check that the programs still draw the same:
+```
+python -m scratchypy.golden examples/*.py
+```
+Golden images go in a 'golden' folder next to each program.  For a frame
+that differs, an image with the different pixels in red is saved in the
+diff folder.
+
+Every program runs in its own process with no window shown, the random
+module seeded, and a fixed timestep, so the timer and waits count frames
+and each run draws the same frames.  It ends by itself after the last frame
+asked for.
+"""
+import argparse
+import os
+import random
+import runpy
+import subprocess
+import sys
+import tempfile
+import pygame
+
+FRAMES = (1, 30, 60)
+TOLERANCE = 8
+DIFF_COLOR = (255, 0, 0)
+
+
+class _Selected:
+    """ Recorder sink that writes only some frames as PNG """
+    ordered = False
+
+    def __init__(self, sink, frames):
+        self._sink = sink
+        self._frames = set(frames)
+
+    def open(self, size, fps):
+        self._sink.open(size, fps)
+
+    def write(self, frame:int, data:bytes, size):
+        if frame in self._frames:
+            self._sink.write(frame, data, size)
+
+    def close(self):
+        self._sink.close()
+
+
+def golden_name(script:str, frame:int) -> str:
+    """ @return the file name of the golden image of a frame """
+    return "%s_%04d.png" % (os.path.splitext(os.path.basename(script))[0], frame)
+
+def run_scenario(script:str, frames, outFolder:str, seed:int=0):
+    """
+    Run a program in this process and save the chosen frames as PNG files
+    named by golden_name().  A window can only run once per process.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    from scratchypy import get_window, recorder
+    script = os.path.abspath(script)
+    outFolder = os.path.abspath(outFolder)
+    name = os.path.splitext(os.path.basename(script))[0]
+    window = get_window()
+    window.replay_input([ (max(frames), pygame.event.Event(pygame.QUIT)) ])
+    window.set_fixed_timestep(True)
+    window.record_frames(_Selected(recorder.PngSequence(outFolder, name + "_%04d.png", level=9), frames))
+    random.seed(seed)
+    os.chdir(os.path.dirname(script)) # for its relative asset file names
+    sys.argv = [script]
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit:
+        pass
+    window.stop_recording()
+
+def compare(actual:pygame.Surface, golden:pygame.Surface, tolerance:int=TOLERANCE):
+    """
+    Compare two images pixel by pixel.
+    @param tolerance How much each of red, green and blue may differ.
+    @return (number of different pixels, diff image) where the diff image is
+            a faded copy of the golden one with different pixels in red, or
+            None if the sizes differ.
+    """
+    if actual.get_size() != golden.get_size():
+        return (actual.get_width() * actual.get_height(), None)
+    # all the same format, as threshold() maps the color with the wrong one
+    actual, golden = _rgb32(actual), _rgb32(golden)
+    diff = golden.copy()
+    fade = pygame.Surface(diff.get_size())
+    fade.fill((160, 160, 160))
+    diff.blit(fade, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+    same = pygame.transform.threshold(diff, actual, search_color=None,
+                                      threshold=(tolerance, tolerance, tolerance, 255),
+                                      set_color=DIFF_COLOR, set_behavior=1,
+                                      search_surf=golden, inverse_set=False)
+    return (actual.get_width() * actual.get_height() - same, diff)
+
+def _rgb32(surface):
+    copy = pygame.Surface(surface.get_size(), 0, 32)
+    copy.blit(surface, (0, 0))
+    return copy
+
+def check(script:str, frames=FRAMES, update:bool=False, tolerance:int=TOLERANCE,
+          maxPixels:int=0, diffFolder:str="golden-diff", seed:int=0) -> bool:
+    """
+    Run a program in a new process and compare its frames with the golden
+    images, or save them as the new golden images.
+    @param maxPixels How many pixels may differ by more than the tolerance.
+    @return True if all frames match.
+    """
+    goldenFolder = os.path.join(os.path.dirname(os.path.abspath(script)), "golden")
+    with tempfile.TemporaryDirectory() as outFolder:
+        args = [sys.executable, "-m", "scratchypy.golden", "--run", script, outFolder,
+                ",".join(map(str, frames)), str(seed)]
+        env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [_package_root(), env.get("PYTHONPATH")]))
+        result = subprocess.run(args, env=env, capture_output=True, text=True)
+        ok = True
+        for frame in frames:
+            name = golden_name(script, frame)
+            actualFile = os.path.join(outFolder, name)
+            goldenFile = os.path.join(goldenFolder, name)
+            if not os.path.exists(actualFile):
+                print("%s: frame %d not drawn\n%s" % (script, frame, result.stderr.strip()))
+                ok = False
+            elif update:
+                os.makedirs(goldenFolder, exist_ok=True)
+                os.replace(actualFile, goldenFile)
+                print("%s: saved %s" % (script, goldenFile))
+            elif not os.path.exists(goldenFile):
+                print("%s: no golden image %s" % (script, goldenFile))
+                ok = False
+            else:
+                bad, diff = compare(pygame.image.load(actualFile), pygame.image.load(goldenFile), tolerance)
+                if bad > maxPixels:
+                    ok = False
+                    os.makedirs(diffFolder, exist_ok=True)
+                    if diff is not None:
+                        pygame.image.save(diff, os.path.join(diffFolder, name))
+                    print("%s: frame %d differs in %d pixels" % (script, frame, bad))
+    return ok
+
+def _package_root():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scratchypy.golden",
+                                     description="Compare the frames programs draw with golden images.")
+    parser.add_argument("scripts", nargs="+", help="programs to run")
+    parser.add_argument("--update", action="store_true", help="save the frames as the golden images")
+    parser.add_argument("--frames", default=",".join(map(str, FRAMES)),
+                        help="frame numbers to compare, default %(default)s")
+    parser.add_argument("--tolerance", type=int, default=TOLERANCE,
+                        help="how much a color may differ, default %(default)s")
+    parser.add_argument("--max-pixels", type=int, default=0,
+                        help="how many pixels may differ more than that, default %(default)s")
+    parser.add_argument("--diff-folder", default="golden-diff",
+                        help="where to save images of differences, default %(default)s")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random module")
+    args = parser.parse_args(argv)
+    frames = [ int(f) for f in args.frames.split(",") ]
+    failed = [ script for script in args.scripts
+               if not check(script, frames, args.update, args.tolerance, args.max_pixels,
+                            args.diff_folder, args.seed) ]
+    if not args.update:
+        print("%d of %d programs match" % (len(args.scripts) - len(failed), len(args.scripts)))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run_scenario(sys.argv[2], [ int(f) for f in sys.argv[4].split(",") ], sys.argv[3], int(sys.argv[5]))
+    else:
+        sys.exit(main())
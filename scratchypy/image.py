@@ -3,20 +3,171 @@
 """
 Contains functions for loading image files.
 The file types it supports are the same as what pygame.image supports.
+
+All images used by ScratchyPy go through normalize(), which converts them to
+the pixel format of the display.  Blitting a surface that is in a different
+format means converting every pixel on every frame, so this makes drawing
+much faster.  Images loaded before the window is shown can't be converted
+yet; their owners register with when_display_ready() to be told when the
+conversion can happen.
+
+Sprite sheets are loaded and converted once as a whole, and each frame is a
+subsurface: a view of the sheet's pixels, not a copy.
 """
 
 import glob
+import json
+import os
+import threading
+import weakref
+import pygame
 import pygame.image
+from scratchypy import diskcache
+from scratchypy.util import synchronized
+
+# Objects with a _normalize_images() method waiting for the display
+_pending = weakref.WeakSet()
+# Surface -> key of the file it was loaded from, for the disk cache
+_sources = weakref.WeakKeyDictionary()
+# Surface -> its normalized copy, so that a surface shared by many sprites is
+# converted once, and frames of a sheet stay views of one converted sheet
+_converted = weakref.WeakKeyDictionary()
+# Guards the above; stages can be made on another thread
+_lock = threading.RLock()
+# For the blit check in debug mode
+_checkBlits = False
+_warned = weakref.WeakSet()
+
+def display_ready() -> bool:
+    """ @return True once the window's display surface exists. """
+    return pygame.display.get_surface() is not None
+
+def is_display_format(surface:pygame.Surface) -> bool:
+    """
+    @return True if the surface can be blitted to the display without a
+            per-pixel format conversion.  Always False before the display
+            exists.
+    """
+    display = pygame.display.get_surface()
+    if display is None:
+        return False
+    if surface.get_flags() & pygame.SRCALPHA:
+        # convert_alpha() format: 32 bits with the display's color layout
+        return surface.get_bitsize() == 32 and \
+            surface.get_masks()[:3] == display.get_masks()[:3]
+    return surface.get_bitsize() == display.get_bitsize() and \
+        surface.get_masks()[:3] == display.get_masks()[:3]
+
+@synchronized(_lock)
+def normalize(surface:pygame.Surface, opaque:bool=False) -> pygame.Surface:
+    """
+    Convert a surface to the display's optimal format.
+    * Surfaces with per-pixel alpha use convert_alpha()
+    * Surfaces with a transparent color key use convert() and RLEACCEL
+    * Others use convert()
+    If the display doesn't exist yet, the surface is returned unchanged; see
+    when_display_ready().
+    @param opaque If True, any alpha channel is dropped, e.g. for backdrops.
+    Subsurfaces, like the frames of a sprite sheet, are made views of the
+    normalized sheet instead of copies, and are not RLE accelerated.
+    @return the converted surface, or the same one if nothing was needed.
+    """
+    if not display_ready():
+        return surface
+    sheet = surface.get_abs_parent()
+    if sheet is not surface:
+        if is_display_format(surface):
+            return surface
+        converted = normalize(sheet, opaque).subsurface(pygame.Rect(surface.get_abs_offset(), surface.get_size()))
+        source = _sources.get(surface)
+        if source is not None:
+            _sources[converted] = source
+        return converted
+    if not opaque:
+        converted = _converted.get(surface)
+        if converted is not None:
+            return converted
+    colorkey = surface.get_colorkey()
+    if colorkey:
+        if is_display_format(surface) and surface.get_flags() & pygame.RLEACCELOK:
+            return surface
+        converted = surface.convert() # color key replaces any per-pixel alpha
+        converted.set_colorkey(colorkey, pygame.RLEACCEL)
+    elif is_display_format(surface) and not (opaque and surface.get_flags() & pygame.SRCALPHA):
+        return surface
+    elif surface.get_flags() & pygame.SRCALPHA and not opaque:
+        converted = surface.convert_alpha()
+    else:
+        converted = surface.convert()
+    source = _sources.get(surface)
+    if source is not None:
+        _sources[converted] = source
+    if not opaque:
+        _converted[surface] = converted
+    return converted
+
+@synchronized(_lock)
+def source_key(surface:pygame.Surface):
+    """
+    @return a key identifying the file contents the surface was loaded from,
+            or None if it was made some other way.
+    """
+    return _sources.get(surface)
+
+@synchronized(_lock)
+def when_display_ready(owner):
+    """
+    Register an object whose images could not be converted because the
+    display did not exist yet.  Its _normalize_images() method is called
+    once the window is shown.  Only a weak reference is kept.
+    """
+    _pending.add(owner)
+
+def _display_created():
+    "Called by the Window when the display surface is made."
+    with _lock:
+        owners = list(_pending)
+        _pending.clear()
+    for owner in owners:
+        owner._normalize_images()
+
+def set_blit_check(onoff:bool=True):
+    """
+    Debug aid: when on, check_blit() prints a warning the first time each
+    surface that is not in display format is drawn.
+    """
+    global _checkBlits
+    _checkBlits = onoff
+
+def check_blit(surface:pygame.Surface, what:str=""):
+    """
+    Called before blitting to flag slow-path surfaces.  Does nothing unless
+    turned on with set_blit_check().
+    @param what A description to print, e.g. the sprite name.
+    """
+    if _checkBlits and surface not in _warned and not is_display_format(surface):
+        _warned.add(surface)
+        print("Slow blit: %s surface %s is not in display format" % (what, surface))
 
 def load(fileName, colorToMakeTransparent:pygame.color.Color=None):
+    key = None
+    if diskcache.enabled():
+        ck = tuple(pygame.Color(colorToMakeTransparent)) if colorToMakeTransparent else None
+        key = diskcache.make_key("load", diskcache.file_key(fileName), ck)
+        cached = diskcache.load(key)
+        if cached:
+            with _lock:
+                _sources[cached[0]] = key
+            return normalize(cached[0])
     surface = pygame.image.load(fileName)
     if colorToMakeTransparent:
-        surface.convert()
         surface.set_colorkey(colorToMakeTransparent)
-    else:
-        # support per-pixel alpha
-        surface.convert_alpha()
-    return surface
+    # else supports per-pixel alpha
+    if key is not None:
+        diskcache.store(key, surface)
+        with _lock:
+            _sources[surface] = key
+    return normalize(surface)
 
 def loadAll(listOfFiles, transparentColor:pygame.color.Color=None):
     return [ load(f, transparentColor) for f in listOfFiles ]
@@ -33,4 +184,72 @@ def loadPattern(globPattern, transparentColor:pygame.color.Color=None):
     listOfFiles = glob.glob(globPattern)
     listOfFiles.sort()
     return [ load(f, transparentColor) for f in listOfFiles ]
-    
\ No newline at end of file
+
+
+def load_sheet(fileName, frameWidth:int, frameHeight:int, count:int=None,
+               margin:int=0, spacing:int=0,
+               colorToMakeTransparent:pygame.color.Color=None):
+    """
+    Load a sprite sheet: one image with all the frames of an animation in a
+    grid, read left to right then top to bottom.  The file is decoded once
+    and each frame is a view of it, so this is much cheaper than a file per
+    frame.  The result can be given to Sprite or AnimatedSprite as costumes.
+    @param frameWidth, frameHeight The size of each frame in pixels.
+    @param count How many frames, if the last row is not full.
+    @param margin Pixels around the edge of the sheet.
+    @param spacing Pixels between frames.
+    @return a list of Surfaces
+    """
+    sheet = load(fileName, colorToMakeTransparent)
+    width, height = sheet.get_size()
+    frames = []
+    for y in range(margin, height - margin - frameHeight + 1, frameHeight + spacing):
+        for x in range(margin, width - margin - frameWidth + 1, frameWidth + spacing):
+            if count is not None and len(frames) >= count:
+                return frames
+            frames.append(_sheet_frame(sheet, pygame.Rect(x, y, frameWidth, frameHeight)))
+    return frames
+
+def load_sheet_json(fileName, colorToMakeTransparent:pygame.color.Color=None):
+    """
+    Load a sprite sheet described by a JSON file, as exported by Aseprite,
+    TexturePacker and similar tools, in either their hash or array layout.
+    The sheet image is found from the "meta" section, relative to the JSON
+    file.
+    @return a dict of frame name -> Surface in the file's order, which can
+            be given to Sprite or AnimatedSprite so the costumes are named.
+    """
+    with open(fileName) as f:
+        data = json.load(f)
+    sheet = load(os.path.join(os.path.dirname(fileName), data["meta"]["image"]),
+                 colorToMakeTransparent)
+    frames = data["frames"]
+    if isinstance(frames, dict):
+        frames = [dict(info, filename=name) for name, info in frames.items()]
+    result = {}
+    for info in frames:
+        r = info["frame"]
+        if info.get("rotated"):
+            # stored turned clockwise
+            region = sheet.subsurface(pygame.Rect(r["x"], r["y"], r["h"], r["w"]))
+            surface = pygame.transform.rotate(region, 90)
+        else:
+            surface = _sheet_frame(sheet, pygame.Rect(r["x"], r["y"], r["w"], r["h"]))
+        if info.get("trimmed"):
+            # put back the transparent border that was cut off
+            full = info["sourceSize"]
+            offset = info["spriteSourceSize"]
+            padded = pygame.Surface((full["w"], full["h"]), pygame.SRCALPHA)
+            padded.fill((0, 0, 0, 0))
+            padded.blit(surface, (offset["x"], offset["y"]))
+            surface = normalize(padded)
+        result[info["filename"]] = surface
+    return result
+
+@synchronized(_lock)
+def _sheet_frame(sheet, rect):
+    frame = sheet.subsurface(rect)
+    source = _sources.get(sheet)
+    if source is not None:
+        _sources[frame] = diskcache.make_key("sheet", source, tuple(rect))
+    return frame
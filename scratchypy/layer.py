@@ -0,0 +1,168 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+A Layer is a substage: a stage with its own sprites, backdrop and handlers,
+shown inside another stage.  It is drawn into a surface of its own, which is
+kept and put on the screen with one blit each frame.  It is only drawn
+again when something in it changed, checked at most at its own rate:
+```
+hud = Layer(size=(800, 40), fps=5)
+score = TextSprite("Score: 0", topleft=(10, 5), stage=hud)
+stage.add_layer(hud)
+
+hills = Layer(size=(3000, 600), parallax=0.5)
+hills.add_backdrop("hills.png")
+stage.add_layer(hills, below=True)
+```
+Sprites in a layer still get their tick handlers, glides and animations
+every frame; only drawing is saved.  Positions of its sprites are within
+the layer, with (0, 0) at its top left.
+
+Layers show above the stage's sprites, or below them if asked, after the
+backdrop and pen.  Clicks, keys and broadcasts are passed on to them.
+Layers can have layers of their own.
+
+With a camera on the stage, a layer moves with the world by its parallax:
+0 stays fixed on the screen, like a HUD, 1 moves with the world, and 0.5
+moves half as fast, like far away scenery.
+"""
+import pygame
+from scratchypy.stage import Stage
+from scratchypy import image
+import scratchypy.window
+
+
+class Layer(Stage):
+    def __init__(self, size=None, position=(0, 0), fps:float=None, parallax:float=0,
+                 opaque:bool=False):
+        """
+        @param size (w, h) of the layer, default the window's size.
+        @param position Where its top left is shown in the stage.
+        @param fps How many times a second at most to check for changes and
+               draw again, or None for every frame.
+        @param parallax How much it moves with the stage's camera, see above.
+        @param opaque True if the layer covers its whole area, e.g. with a
+               backdrop, which makes it faster to show.
+        """
+        self._size = tuple(size) if size is not None else scratchypy.window.get_window().size
+        self._position = tuple(position)
+        self._fps = fps
+        self.parallax = parallax
+        self._opaque = opaque
+        self._surface = None
+        self._signature = None
+        self._checkedFrame = None
+        self._dirty = True
+        self._shownAt = self._position # top left on the screen, last frame
+        self.redraws = 0 # how many times it has been drawn
+        super().__init__()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def position(self):
+        return self._position
+
+    def go_to(self, x:int, y:int):
+        """ Show the layer with its top left at (x, y) in the stage. """
+        self._position = (x, y)
+
+    @property
+    def rect(self) -> pygame.Rect:
+        """ Where the layer was shown on the screen last frame """
+        return pygame.Rect(self._shownAt, self._size)
+
+    def refresh(self):
+        """
+        Draw the layer again on the next frame, e.g. after drawing on a
+        sprite's image directly, which can't be noticed.
+        """
+        self._dirty = True
+
+    def _canvas_size(self):
+        return self._size
+
+    def _changed(self) -> bool:
+        """ Compare what would be drawn with last time, cheaply """
+        signature = (self._backdropId, bool(self._penSprites), self._penRevision,
+                     [ (tm._x, tm._y, tm._changes) for tm in self._tilemaps ],
+                     [ (sp._image, sp._image.get_alpha(), sp._rect.x, sp._rect.y,
+                        sp._visible, sp._bubble, sp._debug) for sp in self._sprites ],
+                     [ (layer.redraws, layer._position) for layer in self._layersBelow + self._layersAbove ])
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return True
+
+    def _due(self, frame:int) -> bool:
+        if self._fps is None:
+            return True
+        if self._checkedFrame is not None and \
+                frame - self._checkedFrame < scratchypy.window.Window.FPS / self._fps:
+            return False
+        self._checkedFrame = frame
+        return True
+
+    def _tick(self):
+        """ Everything but drawing, done every frame """
+        self._tweens.step()
+        self._animations.step(scratchypy.window.Window.FRAME_SEC)
+        self._on_tick()
+        for sprite in self._sprites:
+            sprite.update()
+        frame = scratchypy.window.get_window().frame_number
+        for layer in self._layersBelow + self._layersAbove:
+            layer._tick()
+            layer._refresh(frame)
+
+    def _refresh(self, frame:int):
+        if self._surface is None or self._dirty:
+            self._dirty = False
+            self._redraw()
+        elif self._due(frame) and self._changed():
+            self._redraw()
+
+    def _redraw(self):
+        if self._surface is None:
+            flags = 0 if self._opaque else pygame.SRCALPHA
+            self._surface = image.normalize(pygame.Surface(self._size, flags), opaque=self._opaque)
+        surface = self._surface
+        if self._opaque:
+            surface.fill(scratchypy.window.get_window()._backgroundColor)
+        else:
+            surface.fill((0, 0, 0, 0))
+        if self._backdropId >= 0:
+            surface.blit(self._backdrops[self._backdropId].surface(self._size), (0, 0))
+        for tilemap in self._tilemaps:
+            tilemap._render(surface, surface.get_rect(), (0, 0))
+        if self._penSprites:
+            pen = self._pen_surface()
+            for sprite in self._penSprites:
+                sprite._draw_pen(pen)
+            self._penSprites.clear()
+        if self._pen is not None:
+            surface.blit(self._pen, (0, 0))
+        for layer in self._layersBelow:
+            layer._show(surface, (0, 0))
+        for sprite in self._sprites:
+            sprite._render(surface)
+        for layer in self._layersAbove:
+            layer._show(surface, (0, 0))
+        self._draw_raw(surface)
+        self.redraws += 1
+        self._changed() # remember what was drawn, after pen drawing bumped it
+
+    def _show(self, screen, offset):
+        """ Blit the kept surface, moved by the parent's camera offset """
+        x = self._position[0] + int(offset[0] * self.parallax)
+        y = self._position[1] + int(offset[1] * self.parallax)
+        self._shownAt = (x, y)
+        screen.blit(self._surface, (x, y))
+
+    def _composite(self, screen, offset):
+        """ Called by the parent stage every frame """
+        self._tick()
+        self._refresh(scratchypy.window.get_window().frame_number)
+        self._show(screen, offset)
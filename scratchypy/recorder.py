@@ -0,0 +1,197 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Recording the frames a window draws, as a folder of PNG images or a video
+made by an encoder program such as ffmpeg:
+```
+get_window().record_frames(recorder.PngSequence("frames"))
+get_window().record_frames(recorder.EncoderPipe.ffmpeg("clip.mp4"), realTime=False)
+```
+Each finished frame is copied once as raw bytes and put on a queue; the
+slow part, compressing or piping it, happens on background threads so the
+frame loop only pays for the copy.  When the queue is full the window
+either waits for it (BLOCK, no frames lost) or skips the frame (DROP, the
+game keeps its speed).
+
+With realTime=False frames are drawn as fast as they can be recorded, and
+the window's timer counts frames instead of real seconds, so the recording
+is the same as if it had been played at normal speed.  Set the environment
+variable SDL_VIDEODRIVER=dummy to record with no window shown.
+"""
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import zlib
+import pygame
+
+BLOCK = "block"
+DROP = "drop"
+POLICIES = (BLOCK, DROP)
+
+_STOP = None # queued to tell a worker to finish
+
+
+def write_png(fileName:str, data:bytes, size, level:int=1):
+    """
+    Write raw RGB bytes as a PNG file.  Faster than pygame.image.save() with
+    the low compression level, and lets other threads run while it works.
+    """
+    w, h = size
+    stride = w * 3
+    raw = b"".join(b"\0" + data[y * stride:(y + 1) * stride] for y in range(h))
+    def chunk(kind, body):
+        return (struct.pack(">I", len(body)) + kind + body
+                + struct.pack(">I", zlib.crc32(kind + body)))
+    with open(fileName, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, level)))
+        f.write(chunk(b"IEND", b""))
+
+
+class PngSequence:
+    """
+    Saves each frame as a numbered PNG file in a folder.  Frames are
+    written by several threads, in any order, since each has its own file.
+    """
+    ordered = False
+
+    def __init__(self, folder:str, pattern:str="frame%06d.png", level:int=1):
+        """
+        @param pattern File name with a place for the frame number.
+        @param level zlib compression, 1 (fast) to 9 (small).
+        """
+        os.makedirs(folder, exist_ok=True)
+        self._folder = folder
+        self._pattern = pattern
+        self._level = level
+
+    def open(self, size, fps):
+        pass
+
+    def write(self, frame:int, data:bytes, size):
+        write_png(os.path.join(self._folder, self._pattern % frame), data, size, self._level)
+
+    def close(self):
+        pass
+
+
+class EncoderPipe:
+    """
+    Sends raw RGB frames, in order, to the standard input of an encoder
+    program.  {width}, {height} and {fps} in the command are filled in.
+    """
+    ordered = True
+
+    def __init__(self, command):
+        """
+        @param command List of program arguments, see ffmpeg() for an example.
+        """
+        self._command = command
+        self._process = None
+
+    @classmethod
+    def ffmpeg(cls, fileName:str, *outputArgs):
+        """
+        Encode a video file with ffmpeg, which must be installed.
+        @param outputArgs Extra ffmpeg options for the output, otherwise it
+               picks them from the file extension.
+        """
+        program = shutil.which("ffmpeg")
+        if program is None:
+            raise FileNotFoundError("ffmpeg is not installed or not on the PATH")
+        return cls([program, "-loglevel", "error", "-y",
+                    "-f", "rawvideo", "-pix_fmt", "rgb24",
+                    "-s", "{width}x{height}", "-r", "{fps}", "-i", "-",
+                    "-pix_fmt", "yuv420p", *outputArgs, fileName])
+
+    def open(self, size, fps):
+        args = [ a.format(width=size[0], height=size[1], fps=fps) for a in self._command ]
+        self._process = subprocess.Popen(args, stdin=subprocess.PIPE)
+
+    def write(self, frame:int, data:bytes, size):
+        self._process.stdin.write(data)
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdin.close()
+            self._process.wait()
+            self._process = None
+
+
+class FrameRecorder:
+    """
+    Copies frames from the screen and hands them to a sink, such as
+    PngSequence or EncoderPipe, on background threads.  Made by
+    Window.record_frames().
+    A sink has open(size, fps), write(frame, data, size) and close()
+    methods, and `ordered` True if frames must be written one at a time in
+    order.
+    """
+    def __init__(self, sink, fps:int, policy:str=BLOCK, queueSize:int=32, threads:int=None):
+        """
+        @param fps Frame rate the recording plays at.
+        @param policy BLOCK to wait when the queue is full, DROP to skip frames.
+        @param queueSize Frames that can wait to be written.  Each takes
+               width*height*3 bytes.
+        @param threads Writer threads; always 1 for an ordered sink.
+        """
+        if policy not in POLICIES:
+            raise ValueError("policy must be one of " + ", ".join(POLICIES))
+        self._sink = sink
+        self._fps = fps
+        self._policy = policy
+        self._queue = queue.Queue(queueSize)
+        if sink.ordered:
+            threads = 1
+        elif threads is None:
+            threads = min(4, os.cpu_count() or 1)
+        self._threadCount = threads
+        self._threads = []
+        self._error = None
+        self.recorded = 0
+        self.dropped = 0
+
+    def _start(self, size):
+        self._sink.open(size, self._fps)
+        for i in range(self._threadCount):
+            thread = threading.Thread(target=self._work, name="recorder%d" % i, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def capture(self, screen:pygame.Surface, frame:int):
+        """ Queue a copy of the screen, from the frame loop """
+        if self._error is not None:
+            return
+        if not self._threads:
+            self._start(screen.get_size())
+        if self._policy == DROP and self._queue.full():
+            self.dropped += 1 # without spending time on the copy
+            return
+        # only the frame loop adds, so there is room now if not blocking
+        self._queue.put((frame, pygame.image.tobytes(screen, "RGB"), screen.get_size()))
+        self.recorded += 1
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._error is None: # after an error, only empty the queue
+                try:
+                    self._sink.write(*item)
+                except Exception as ex:
+                    self._error = ex
+                    print("Recording stopped: %s" % ex)
+
+    def close(self):
+        """ Write all queued frames and finish the sink. """
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._sink.close()
@@ -0,0 +1,244 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Recording and replaying of input events, for making reproducible runs and
+load tests.
+
+Events are stored one per line as JSON (JSONL), stamped with the frame number
+they were delivered on:
+```
+{"frame": 12, "type": "mousebuttondown", "pos": [100, 200], "button": 1}
+```
+Only mouse, keyboard and quit events are kept; everything else pygame sends
+is passed through live but not recorded.
+
+Typical use:
+```
+get_window().record_input("session.jsonl")     # play, then quit
+...
+get_window().replay_input("session.jsonl")      # same run again
+```
+"""
+import json
+import random
+import pygame
+import pygame.event
+import pygame.key
+
+# Name used in the file <-> pygame event type
+_EVENT_TYPES = {
+    "quit": pygame.QUIT,
+    "mousebuttondown": pygame.MOUSEBUTTONDOWN,
+    "mousebuttonup": pygame.MOUSEBUTTONUP,
+    "mousemotion": pygame.MOUSEMOTION,
+    "keydown": pygame.KEYDOWN,
+    "keyup": pygame.KEYUP,
+}
+_EVENT_NAMES = { v:k for k,v in _EVENT_TYPES.items() }
+
+# Event attributes worth keeping.  Others (e.g. 'window') are not portable.
+_EVENT_FIELDS = ("pos", "rel", "buttons", "button", "touch",
+                 "key", "mod", "unicode", "scancode")
+
+
+def event_to_dict(frame:int, event:pygame.event.Event) -> dict:
+    """
+    Convert a pygame event to a plain dictionary that can be saved as JSON.
+    @return the dictionary, or None if the event type is not recorded.
+    """
+    name = _EVENT_NAMES.get(event.type)
+    if name is None:
+        return None
+    d = {"frame": frame, "type": name}
+    for field in _EVENT_FIELDS:
+        if field in event.dict:
+            value = event.dict[field]
+            d[field] = list(value) if isinstance(value, tuple) else value
+    return d
+
+def dict_to_event(d:dict):
+    """
+    Convert a dictionary made by event_to_dict() back into a
+    (frame, pygame.event.Event) tuple.
+    """
+    attrs = { k:(tuple(v) if isinstance(v, list) else v)
+              for k,v in d.items() if k in _EVENT_FIELDS }
+    return (d["frame"], pygame.event.Event(_EVENT_TYPES[d["type"]], attrs))
+
+
+class LiveInput:
+    """
+    The default input source, which reads straight from pygame.
+    Input sources have two methods called by the Window:
+    * get_events(frame): return the list of events for this frame
+    * get_pressed(): return the key state, like pygame.key.get_pressed()
+    """
+    def get_events(self, frame:int):
+        return pygame.event.get()
+
+    def get_pressed(self):
+        return pygame.key.get_pressed()
+
+    def close(self):
+        pass
+
+
+class InputRecorder:
+    """
+    Input source that passes events through from another source while
+    writing them to a JSONL file.
+    """
+    def __init__(self, fileName:str, source=None):
+        """
+        @param fileName Where to write the events.  Overwritten if it exists.
+        @param source The input source to record from; default is live input.
+        """
+        self._source = source if source is not None else LiveInput()
+        self._file = open(fileName, "w")
+
+    def get_events(self, frame:int):
+        events = self._source.get_events(frame)
+        for event in events:
+            d = event_to_dict(frame, event)
+            if d is not None:
+                self._file.write(json.dumps(d, separators=(',', ':')) + "\n")
+        return events
+
+    def get_pressed(self):
+        return self._source.get_pressed()
+
+    def close(self):
+        """ Flush and close the file.  Called by the Window on exit. """
+        if not self._file.closed:
+            self._file.close()
+        self._source.close()
+
+
+class InputReplayer:
+    """
+    Input source that feeds back recorded events at the same frame numbers
+    they were recorded on.  Live input is ignored, except for closing the
+    window.
+    The key state for Window.key_pressed() is tracked from the replayed
+    KEYDOWN/KEYUP events so it matches the recording too.
+    """
+    def __init__(self, events, quitAtEnd:bool=True):
+        """
+        @param events Either a file name written by InputRecorder, or a list
+               of (frame, pygame.event.Event) tuples, such as from
+               click_storm().
+        @param quitAtEnd If True, a QUIT event is sent on the frame after
+               the last recorded events, once they have been handled, so
+               that the run ends by itself.
+        """
+        if isinstance(events, str):
+            events = load_events(events)
+        self._events = sorted(events, key=lambda fe: fe[0]) # stable
+        self._next = 0
+        self._quitAtEnd = quitAtEnd
+        self._endFrame = None # when the last events were sent
+        self._pressed = set()
+
+    @property
+    def remaining(self) -> int:
+        "@return the number of events not replayed yet"
+        return len(self._events) - self._next
+
+    def get_events(self, frame:int):
+        # Keep pygame's queue drained but only honor requests to close
+        out = [e for e in pygame.event.get() if e.type == pygame.QUIT]
+        events = self._events
+        i = self._next
+        while i < len(events) and events[i][0] <= frame:
+            event = events[i][1]
+            if event.type == pygame.KEYDOWN:
+                self._pressed.add(event.key)
+            elif event.type == pygame.KEYUP:
+                self._pressed.discard(event.key)
+            out.append(event)
+            i += 1
+        self._next = i
+        if i >= len(events) and self._quitAtEnd:
+            if self._endFrame is None:
+                self._endFrame = frame
+            elif frame > self._endFrame:
+                out.append(pygame.event.Event(pygame.QUIT))
+        return out
+
+    def get_pressed(self):
+        return _KeyState(self._pressed)
+
+    def close(self):
+        pass
+
+
+class _KeyState:
+    """
+    Minimal stand-in for the sequence returned by pygame.key.get_pressed().
+    """
+    def __init__(self, pressed):
+        self._pressed = pressed
+
+    def __getitem__(self, key):
+        return key in self._pressed
+
+    def __len__(self):
+        return 1 << 30 # any key code is in range
+
+    def __iter__(self):
+        # Only used by any(); pressed keys are all that matter
+        return iter([True] * len(self._pressed))
+
+
+def load_events(fileName:str):
+    """
+    Read a JSONL file written by InputRecorder.
+    @return a list of (frame, pygame.event.Event) tuples
+    """
+    with open(fileName) as f:
+        return [dict_to_event(json.loads(line)) for line in f if line.strip()]
+
+def save_events(fileName:str, events):
+    """
+    Write a list of (frame, pygame.event.Event) tuples to a JSONL file, e.g.
+    to keep a synthetic storm from click_storm() for later runs.
+    """
+    with open(fileName, "w") as f:
+        for frame, event in events:
+            d = event_to_dict(frame, event)
+            if d is not None:
+                f.write(json.dumps(d, separators=(',', ':')) + "\n")
+
+def click_storm(clicksPerSecond:float=1000, seconds:float=1,
+                area=(800,600), fps:int=30, startFrame:int=0,
+                button:int=1, seed=None):
+    """
+    Generate a synthetic burst of mouse clicks at random positions, for
+    stress testing event dispatch.  Each click is a MOUSEMOTION,
+    MOUSEBUTTONDOWN and MOUSEBUTTONUP, like a real one.
+    @param clicksPerSecond How many clicks to send.  Fractional clicks per
+           frame are carried over to the following frames.
+    @param seconds How long the storm lasts.
+    @param area (width, height) to pick positions in, usually the window size.
+    @param fps The frame rate to convert seconds to frames; use Window.FPS.
+    @param startFrame The frame number of the first clicks.
+    @param button The mouse button, 1 is the left button.
+    @param seed Optional seed so the same storm can be made again.
+    @return a list of (frame, pygame.event.Event) tuples for InputReplayer.
+    """
+    rand = random.Random(seed)
+    perFrame = clicksPerSecond / fps
+    events = []
+    owed = 0.0
+    for frame in range(startFrame, startFrame + int(seconds * fps)):
+        owed += perFrame
+        while owed >= 1:
+            owed -= 1
+            pos = (rand.randrange(area[0]), rand.randrange(area[1]))
+            events.append((frame, pygame.event.Event(pygame.MOUSEMOTION,
+                            pos=pos, rel=(0,0), buttons=(0,0,0), touch=False)))
+            events.append((frame, pygame.event.Event(pygame.MOUSEBUTTONDOWN,
+                            pos=pos, button=button, touch=False)))
+            events.append((frame, pygame.event.Event(pygame.MOUSEBUTTONUP,
+                            pos=pos, button=button, touch=False)))
+    return events
@@ -0,0 +1,468 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+A cooperative scheduler for scripts: the async callbacks of sprites and
+stages, and coroutines given to Sprite.run() or Stage.run().
+
+Scratch projects have lots of little 'forever' scripts that do a bit of work
+and wait for the next frame.  As asyncio Tasks, each of those is woken every
+frame through an Event, which makes a Future and a Handle per script per
+frame.  Here the scripts waiting for the next frame are kept in a list and
+resumed directly by the window right after it draws.
+
+Anything else a script awaits, like asyncio.sleep() or another task, works
+as it would in a Task: the script is resumed when that finishes.
+
+Waiting some number of frames, as wait() does, uses a timer wheel counted in
+frames rather than the event loop's timers.  Everything due on a frame is
+woken together just before that frame is drawn, so sprites never change in
+the middle of one.
+
+A script can belong to an owner, the stage it was started for.  Suspending
+the owner parks its scripts where they are, and resuming it lets them go on,
+with the frames left on their waits.
+
+Plain generators can be scripts too, where a bare `yield` waits for the next
+frame:
+```
+def spin(sprite):
+    while True:
+        sprite.turn(5)
+        yield
+stage.run(spin(sprite))
+```
+"""
+import asyncio
+import inspect
+import traceback
+
+
+class Script:
+    """
+    A handle to one running script.  Like an asyncio Task, it can be
+    cancelled or awaited for the script's result.
+    """
+    __slots__ = ("_coro", "_name", "_owner", "_isGenerator", "_done", "_cancelled",
+                 "_mustCancel", "_waitingOn", "_result", "_exception",
+                 "_callbacks", "_future")
+
+    def __init__(self, coro, name:str=None, owner=None):
+        self._coro = coro
+        self._name = name if name else getattr(coro, "__qualname__", "script")
+        self._owner = owner
+        self._isGenerator = inspect.isgenerator(coro)
+        self._done = False
+        self._cancelled = False
+        self._mustCancel = False # throw CancelledError when next resumed
+        self._waitingOn = None # asyncio future it is waiting for
+        self._result = None
+        self._exception = None
+        self._callbacks = None
+        self._future = None # only made if someone awaits
+
+    def get_name(self) -> str:
+        return self._name
+
+    def done(self) -> bool:
+        return self._done
+
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def result(self):
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def cancel(self) -> bool:
+        """
+        Ask the script to stop: CancelledError is raised inside it when it
+        next resumes, like Task.cancel().
+        @return False if it was already done.
+        """
+        if self._done:
+            return False
+        waitingOn = self._waitingOn
+        if isinstance(waitingOn, Timer):
+            waitingOn.cancel()
+            self._mustCancel = True
+            asyncio.get_running_loop().call_soon(_scheduler._wakeup, self)
+            return True
+        if waitingOn is not None and waitingOn.cancel():
+            return True # resumes with the CancelledError from the future
+        self._mustCancel = True
+        return True
+
+    def add_done_callback(self, fn):
+        """ Call fn(script) when the script finishes. """
+        if self._done:
+            fn(self)
+        elif self._callbacks is None:
+            self._callbacks = [fn]
+        else:
+            self._callbacks.append(fn)
+
+    def _finish(self, result=None, exception=None, cancelled=False):
+        self._done = True
+        self._result = result
+        self._exception = exception
+        self._cancelled = cancelled
+        self._coro = None
+        future = self._future
+        if future is not None and not future.done():
+            if cancelled:
+                future.cancel()
+            elif exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        if self._callbacks:
+            for fn in self._callbacks:
+                fn(self)
+            self._callbacks = None
+
+    def __await__(self):
+        if not self._done:
+            if self._future is None:
+                self._future = asyncio.get_running_loop().create_future()
+            return (yield from self._future.__await__())
+        if self._cancelled:
+            raise asyncio.CancelledError()
+        return self.result()
+
+    def __repr__(self):
+        state = "done" if self._done else "waiting" if self._waitingOn else "pending"
+        return "<Script %s %s>" % (self._name, state)
+
+
+class _NextFrame:
+    """ Awaited by a script to be resumed on the next frame. """
+    __slots__ = ()
+    def __await__(self):
+        yield self
+        return True
+
+NEXT_FRAME = _NextFrame()
+# Yielded by a script that something else will wake up
+_SUSPENDED = object()
+
+
+class Timer:
+    """ A callback due on some frame, from TimerWheel.add() """
+    __slots__ = ("frame", "_callback", "_arg", "_slot", "_wheel")
+
+    def __init__(self, wheel, frame:int, callback, arg):
+        self.frame = frame
+        self._callback = callback
+        self._arg = arg
+        self._slot = None # the dict it is in, while pending
+        self._wheel = wheel
+
+    def pending(self) -> bool:
+        return self._slot is not None
+
+    def cancel(self) -> bool:
+        """ @return False if it already fired or was cancelled. """
+        if self._slot is None:
+            return False
+        del self._slot[self]
+        self._slot = None
+        self._wheel._count -= 1
+        return True
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel keyed by frame number.  Level 0 has a slot for
+    each of the next 64 frames; each level above covers 64 times the frames
+    per slot of the one below, and its slots are moved down a level as the
+    current frame gets to them.  Adding and cancelling are O(1).
+    """
+    BITS = 6
+    SLOTS = 1 << BITS
+    MASK = SLOTS - 1
+    LEVELS = 4 # 16.7 million frames, or 6 days at 30 fps
+
+    def __init__(self):
+        self._now = 0
+        self._count = 0
+        # each slot is a dict used as an ordered set of Timers
+        self._levels = [[{} for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+
+    def __len__(self):
+        """ @return the number of pending timers """
+        return self._count
+
+    @property
+    def frame(self) -> int:
+        """ The last frame advanced to """
+        return self._now
+
+    def add(self, frames:int, callback, arg=None) -> Timer:
+        """
+        Call callback(arg) some frames from now, at least one.
+        """
+        timer = Timer(self, self._now + max(1, int(frames)), callback, arg)
+        self._insert(timer)
+        self._count += 1
+        return timer
+
+    def _insert(self, timer):
+        delta = timer.frame - self._now
+        level = 0
+        while level < self.LEVELS - 1 and delta >= 1 << (self.BITS * (level + 1)):
+            level += 1
+        if delta >= 1 << (self.BITS * self.LEVELS):
+            # too far out; park it in the farthest slot and look again then
+            index = (self._now >> (self.BITS * level)) - 1
+        else:
+            index = timer.frame >> (self.BITS * level)
+        slot = self._levels[level][index & self.MASK]
+        slot[timer] = None
+        timer._slot = slot
+
+    def advance(self, frame:int):
+        """
+        Move forward to the frame, calling every timer due by then.
+        """
+        while self._now < frame:
+            self._now += 1
+            now = self._now
+            # bring down the timers of higher levels when their slot comes up
+            level = 1
+            while level < self.LEVELS and now & ((1 << (self.BITS * level)) - 1) == 0:
+                self._cascade(self._levels[level], (now >> (self.BITS * level)) & self.MASK)
+                level += 1
+            slot = self._levels[0][now & self.MASK]
+            if slot:
+                timers = list(slot)
+                slot.clear()
+                self._count -= len(timers)
+                for timer in timers:
+                    timer._slot = None
+                for timer in timers:
+                    # one failing must not stop the rest
+                    try:
+                        timer._callback(timer._arg)
+                    except Exception as ex:
+                        print("Timer error: %s" % ex)
+                        traceback.print_exception(ex, ex, ex.__traceback__)
+
+    def _cascade(self, slots, index):
+        timers = list(slots[index])
+        slots[index].clear()
+        for timer in timers:
+            self._insert(timer)
+
+
+class _Sleep:
+    """ Awaitable for some frames to pass. """
+    __slots__ = ("_frames",)
+    def __init__(self, frames):
+        self._frames = frames
+
+    def __await__(self):
+        sched = _scheduler
+        script = sched._current
+        if script is not None:
+            script._waitingOn = sched._timers.add(self._frames, sched._wakeup, script)
+            yield _SUSPENDED
+            return None
+        # a regular Task; wake it through a future
+        future = asyncio.get_running_loop().create_future()
+        timer = sched._timers.add(self._frames, _set_result, future)
+        try:
+            return (yield from future.__await__())
+        finally:
+            timer.cancel()
+
+def _set_result(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Scheduler:
+    """
+    Runs the scripts.  There is one, from get_scheduler(), stepped by the
+    window each frame.
+    """
+    def __init__(self):
+        self._nextFrame = [] # scripts to resume on the next frame
+        self._current = None # the script being stepped
+        self._count = 0 # scripts not done yet
+        self._timers = TimerWheel()
+        self._owned = {} # owner -> scripts, as an ordered set
+        self._suspended = {} # owner -> [(script, frames left to wait)]
+
+    def __len__(self):
+        return self._count
+
+    def in_script(self) -> bool:
+        """ @return True when called from code run by a script here. """
+        return self._current is not None
+
+    def spawn(self, coro, name:str=None, owner=None) -> Script:
+        """
+        Start running a coroutine or generator as a script.  It first runs
+        soon, on the event loop, or on the first frame if there is no loop
+        running yet.
+        @param owner Optional stage the script belongs to, for suspend().
+        """
+        if not (inspect.iscoroutine(coro) or inspect.isgenerator(coro)):
+            raise TypeError("A script must be a coroutine or generator, not %r" % (coro,))
+        script = Script(coro, name, owner)
+        self._count += 1
+        if owner is not None:
+            owned = self._owned.get(owner)
+            if owned is None:
+                self._owned[owner] = {script: None}
+            else:
+                owned[script] = None
+        try:
+            asyncio.get_running_loop().call_soon(self._step, script)
+        except RuntimeError:
+            self._nextFrame.append(script)
+        return script
+
+    def suspend(self, owner):
+        """
+        Stop running the owner's scripts until resume().  Their waits stop
+        counting down.
+        """
+        if owner in self._suspended:
+            return
+        parked = self._suspended[owner] = []
+        now = self._timers.frame
+        for script in self._owned.get(owner, ()):
+            waitingOn = script._waitingOn
+            if isinstance(waitingOn, Timer) and waitingOn.cancel():
+                script._waitingOn = None
+                parked.append((script, waitingOn.frame - now))
+        # the rest are parked when they are next woken
+
+    def resume(self, owner):
+        """ Let the owner's scripts run again, from the next frame. """
+        parked = self._suspended.pop(owner, None)
+        if not parked:
+            return
+        for script, frames in parked:
+            if script._done:
+                continue
+            if frames > 0 and not script._mustCancel:
+                script._waitingOn = self._timers.add(frames, self._wakeup, script)
+            else:
+                self._nextFrame.append(script)
+
+    def suspended(self, owner) -> bool:
+        return owner in self._suspended
+
+    def cancel_owned(self, owner):
+        """ Cancel all the owner's scripts, even if it is suspended. """
+        for script in list(self._owned.get(owner, ())):
+            script.cancel()
+        self.resume(owner) # so the parked ones see the cancel
+
+    def pending_timers(self) -> int:
+        """ @return how many waits are not done yet """
+        return len(self._timers)
+
+    def sleep_frames(self, frames:int):
+        """
+        @return an awaitable that finishes after the number of frames, just
+                before the frame is drawn.
+        """
+        return _Sleep(frames)
+
+    def run_timers(self, frame:int):
+        """ Wake everything waiting for the frame about to be drawn. """
+        self._timers.advance(frame)
+
+    def run_frame(self):
+        """ Resume every script waiting for the next frame. """
+        ready = self._nextFrame
+        if not ready:
+            return
+        self._nextFrame = []
+        step = self._step
+        for script in ready:
+            if not script._done:
+                step(script)
+
+    def close(self):
+        """ Stop all the scripts, without resuming them again. """
+        parked = [ script for scripts in self._suspended.values() for script, _ in scripts ]
+        for script in self._nextFrame + parked:
+            if not script._done:
+                script._coro.close()
+                self._end(script, cancelled=True)
+        self._nextFrame = []
+        self._suspended = {}
+
+    def _step(self, script):
+        if script._done:
+            return
+        if self._suspended and script._owner in self._suspended:
+            self._suspended[script._owner].append((script, 0))
+            return
+        self._current = script
+        try:
+            if script._mustCancel:
+                script._mustCancel = False
+                yielded = script._coro.throw(asyncio.CancelledError())
+            else:
+                yielded = script._coro.send(None)
+        except StopIteration as ex:
+            self._end(script, result=ex.value)
+            return
+        except asyncio.CancelledError:
+            self._end(script, cancelled=True)
+            return
+        except Exception as ex:
+            print("Script error: %s: %s" % (script._name, ex))
+            traceback.print_exception(ex, ex, ex.__traceback__)
+            self._end(script, exception=ex)
+            return
+        finally:
+            self._current = None
+
+        if yielded is NEXT_FRAME or (yielded is None and script._isGenerator):
+            self._nextFrame.append(script)
+        elif yielded is _SUSPENDED:
+            pass # _waitingOn will wake it
+        elif getattr(yielded, "_asyncio_future_blocking", None) is not None:
+            # an asyncio future, same protocol as Task
+            yielded._asyncio_future_blocking = False
+            script._waitingOn = yielded
+            yielded.add_done_callback(lambda _, s=script: self._wakeup(s))
+        elif yielded is None:
+            # bare yield, as in asyncio.sleep(0)
+            asyncio.get_running_loop().call_soon(self._step, script)
+        else:
+            ex = RuntimeError("Script %s awaited something other than a future: %r" % (script._name, yielded))
+            print("Script error: %s" % ex)
+            script._coro.close()
+            self._end(script, exception=ex)
+
+    def _wakeup(self, script):
+        script._waitingOn = None
+        self._step(script)
+
+    def _end(self, script, **kw):
+        self._count -= 1
+        if script._owner is not None:
+            owned = self._owned.get(script._owner)
+            if owned is not None:
+                owned.pop(script, None)
+                if not owned:
+                    del self._owned[script._owner]
+        script._finish(**kw)
+
+
+_scheduler = Scheduler()
+
+def get_scheduler() -> Scheduler:
+    return _scheduler
+
+def spawn(coro, name:str=None, owner=None) -> Script:
+    """ Start a coroutine or generator as a script.  @see Scheduler.spawn """
+    return _scheduler.spawn(coro, name, owner)
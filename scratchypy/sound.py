@@ -1,5 +1,203 @@
 # Copyright 2022 Mark Malek
-# See LICENSE file for full license terms. 
+# See LICENSE file for full license terms.
 """
-#TODO
-"""
\ No newline at end of file
+Playing sounds, like the Scratch sound blocks.  Sprites have the same
+functions as methods, with their own volume and pitch effect:
+```
+sound.preload("meow.wav", "music.ogg")
+...
+sprite.start_sound("meow.wav")
+await sprite.play_sound_until_done("music.ogg")
+```
+Sound files are decoded once and kept.  preload() decodes them on background
+threads so the first play doesn't stall a frame; anything not preloaded is
+decoded the first time it is played.
+
+There is a fixed number of mixer channels.  When all are busy, a new sound
+takes over the channel of the oldest sound with the same or lower priority,
+or is not played if every playing sound has a higher priority.
+
+The mixer is started the first time it is needed.  If there is no audio
+device it still works silently, e.g. with SDL_AUDIODRIVER=dummy.
+
+Changing the pitch needs NumPy.  Without it the pitch effect is ignored,
+with a warning the first time.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import pygame
+import pygame.mixer
+
+try:
+    import numpy
+    import pygame.sndarray
+except ImportError:
+    numpy = None
+
+CHANNELS = 16
+# Pitched copies of sounds kept: (Sound, pitch) -> Sound
+PITCH_CACHE_SIZE = 32
+DECODE_THREADS = 2
+
+_samples = {} # file name -> Sound
+_decoding = {} # file name -> concurrent Future of Sound
+_pitched = collections.OrderedDict()
+_pool = None
+_channels = [] # pygame Channels we manage
+_voices = [] # per channel: (priority, start order) of what it plays
+_started = 0 # counter for the start order
+_warned = False
+
+
+def init() -> bool:
+    """
+    Start the mixer if it isn't yet.  Done automatically when needed.
+    @return True if sounds can be played.
+    """
+    if not pygame.mixer.get_init():
+        try:
+            # small buffer for less delay between start_sound and hearing it
+            pygame.mixer.init(buffer=512)
+        except pygame.error as ex:
+            print("No sound: %s" % ex)
+            return False
+    if not _channels:
+        pygame.mixer.set_num_channels(CHANNELS)
+        _channels.extend(pygame.mixer.Channel(i) for i in range(CHANNELS))
+        _voices.extend([None] * CHANNELS)
+    return True
+
+def preload(*fileNames):
+    """
+    Start decoding sound files in the background, so they are ready to play
+    without a wait.
+    """
+    if not init():
+        return
+    global _pool
+    if _pool is None:
+        _pool = concurrent.futures.ThreadPoolExecutor(DECODE_THREADS, thread_name_prefix="sound")
+    for name in fileNames:
+        if name not in _samples and name not in _decoding:
+            _decoding[name] = _pool.submit(pygame.mixer.Sound, name)
+
+def load(fileName) -> pygame.mixer.Sound:
+    """
+    @return the decoded sound, from the cache, or waiting for preload(), or
+            decoding it now.
+    """
+    sound = _samples.get(fileName)
+    if sound is not None:
+        return sound
+    init()
+    future = _decoding.pop(fileName, None)
+    sound = future.result() if future is not None else pygame.mixer.Sound(fileName)
+    _samples[fileName] = sound
+    return sound
+
+async def load_async(fileName) -> pygame.mixer.Sound:
+    """ Like load(), but decode in the background while waiting. """
+    sound = _samples.get(fileName)
+    if sound is not None:
+        return sound
+    preload(fileName)
+    future = _decoding.get(fileName)
+    if future is not None:
+        await asyncio.wrap_future(future)
+    return load(fileName)
+
+def loaded() -> int:
+    """ @return the number of sounds decoded and cached """
+    return len(_samples)
+
+def _get(sound, pitch):
+    if not isinstance(sound, pygame.mixer.Sound):
+        sound = load(sound)
+    pitch = int(round(pitch))
+    if not pitch:
+        return sound
+    if numpy is None:
+        _warn_numpy()
+        return sound
+    key = (sound, pitch)
+    pitched = _pitched.get(key)
+    if pitched is None:
+        pitched = _pitched[key] = _repitch(sound, pitch)
+        while len(_pitched) > PITCH_CACHE_SIZE:
+            _pitched.popitem(last=False)
+    else:
+        _pitched.move_to_end(key)
+    return pitched
+
+def _repitch(sound, pitch):
+    """ Resample like Scratch's pitch effect: 10 is a semitone up """
+    rate = 2 ** (pitch / 120)
+    samples = pygame.sndarray.array(sound)
+    count = max(1, int(len(samples) / rate))
+    indexes = (numpy.arange(count) * rate).astype(numpy.intp)
+    return pygame.sndarray.make_sound(numpy.ascontiguousarray(samples[indexes]))
+
+def _warn_numpy():
+    global _warned
+    if not _warned:
+        _warned = True
+        print("The pitch effect needs numpy: pip install numpy")
+
+def _channel(priority):
+    """
+    @return a free channel, or the one to take over from the oldest sound of
+            no higher priority, or None.
+    """
+    steal = best = None
+    for i, ch in enumerate(_channels):
+        if not ch.get_busy():
+            return i
+        voice = _voices[i] or (priority, 0) # played outside this module
+        if voice[0] <= priority and (best is None or voice < best):
+            steal, best = i, voice
+    return steal
+
+def start_sound(sound, volume:float=100, pitch:float=0, priority:int=0):
+    """
+    Start playing a sound and continue right away.
+    @param sound A file name or pygame.mixer.Sound.
+    @param volume 0..100 percent.
+    @param pitch The pitch effect, where 10 is a semitone up, like Scratch.
+    @param priority Sounds with a higher number can take the channel of
+           lower ones when all are busy.
+    @return the pygame Channel playing it, or None if it could not play.
+    """
+    if not init():
+        return None
+    sound = _get(sound, pitch)
+    i = _channel(priority)
+    if i is None:
+        return None
+    global _started
+    _started += 1
+    _voices[i] = (priority, _started)
+    ch = _channels[i]
+    ch.set_volume(min(max(volume, 0), 100) / 100)
+    ch.play(sound)
+    return ch
+
+async def play_sound_until_done(sound, volume:float=100, pitch:float=0, priority:int=0):
+    """
+    Play a sound and return when it has finished.
+    Parameters as for start_sound().
+    """
+    from scratchypy.window import next_frame
+    if not init():
+        return
+    if not isinstance(sound, pygame.mixer.Sound):
+        sound = await load_async(sound)
+    sound = _get(sound, pitch)
+    ch = start_sound(sound, volume, 0, priority)
+    # until it ends, is stopped, or another sound takes its channel
+    while ch is not None and ch.get_busy() and ch.get_sound() is sound:
+        await next_frame()
+
+def stop_all_sounds():
+    if pygame.mixer.get_init():
+        pygame.mixer.stop()
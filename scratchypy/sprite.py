@@ -10,11 +10,13 @@ import pygame.font
 import math
 import asyncio
 import inspect
+import collections
 import copy
+import os
 import sys
 from typing import Literal, Tuple, Union
-from scratchypy.window import get_window
-from scratchypy import color
+from scratchypy.window import get_window, wait
+from scratchypy import color, image, diskcache, effects, tween, scheduler, animation, tilemap, sound
 from scratchypy.eventcallback import EventCallback
 import scratchypy.text
 
@@ -27,6 +29,95 @@ ALL_AROUND = 2
 # For making unique sprite names
 _idCounter = 0
 
+# How many frames a static sprite must stay unchanged to be drawn into the
+# stage's cached composite again
+STATIC_FRAMES = 30
+
+# Speech bubbles
+_SAY = "say"
+_THINK = "think"
+_RIGHT = 0 # bubble to the right of the sprite, tail on its left
+_LEFT = 1
+BUBBLE_CACHE_SIZE = 64
+_bubbles = collections.OrderedDict() # (text, kind) -> _Bubble
+
+class _Bubble:
+    """
+    The images for one speech or thought bubble.  These are shared by every
+    sprite saying the same thing, and each side is only drawn the first time
+    it is needed.
+    """
+    def __init__(self, bubbleText:str, kind:str):
+        self.key = (bubbleText, kind)
+        font = scratchypy.text.get_font(size=25)
+        bounds = pygame.Rect(0,0,320,320)
+        textSurf = scratchypy.text.render_text(font, bubbleText, bounds)
+        
+        # Draw the bubble - TODO-handle min sizes
+        textRect = textSurf.get_rect().move(4,4) #adjust so can inflate
+        bubbleRect = textRect.inflate(8,8)
+        
+        body = pygame.surface.Surface((bubbleRect.w, bubbleRect.h+10), pygame.SRCALPHA, 32)
+        pygame.draw.rect(body, color.WHITE, bubbleRect, width=0, border_radius=10)
+        pygame.draw.rect(body, color.BLACK, bubbleRect, width=1, border_radius=10)
+        body.blit(textSurf, textRect)
+        self._body = body
+        self.rect = body.get_rect()
+        self._sides = [None, None]
+        
+    def side(self, which:int) -> pygame.Surface:
+        """
+        @return the bubble image with its tail for the _RIGHT or _LEFT side.
+        """
+        surf = self._sides[which]
+        if surf is None:
+            surf = self._body.copy()
+            r = self.rect
+            if self.key[1] == _SAY:
+                # tail for right orientation (left side)
+                points = [ (15, r.bottom-11),
+                           (10, r.bottom),
+                           (22, r.bottom-11) ]
+                if which == _LEFT:
+                    points = [(r.right-x, y) for x,y in points]
+                pygame.draw.polygon(surf, color.WHITE, points, width=0)
+                pygame.draw.lines(surf, color.BLACK, False, points, width=1)
+            else:
+                # little thought circles
+                for x, y, radius in ((16, r.bottom-9, 4), (11, r.bottom-4, 2)):
+                    if which == _LEFT:
+                        x = r.right - x
+                    pygame.draw.circle(surf, color.WHITE, (x, y), radius, width=0)
+                    pygame.draw.circle(surf, color.BLACK, (x, y), radius, width=1)
+            surf = self._sides[which] = image.normalize(surf)
+        return surf
+
+def _get_bubble(bubbleText:str, kind:str) -> _Bubble:
+    "@return the shared bubble for the text, made if needed"
+    key = (bubbleText, kind)
+    bubble = _bubbles.get(key)
+    if bubble is None:
+        bubble = _bubbles[key] = _Bubble(bubbleText, kind)
+        while len(_bubbles) > BUBBLE_CACHE_SIZE:
+            _bubbles.popitem(last=False)
+    else:
+        _bubbles.move_to_end(key)
+    return bubble
+
+def _mask_rect(sprite):
+    """ @return (mask, rect) of a ScratchyPy sprite or a plain pygame one """
+    if isinstance(sprite, Sprite):
+        return sprite._mask, sprite._rect
+    mask = getattr(sprite, "mask", None)
+    return (mask if mask is not None else pygame.mask.from_surface(sprite.image)), sprite.rect
+
+def _collide_mask(left, right) -> bool:
+    """ Like pygame.sprite.collide_mask, for sprites without .image/.mask """
+    leftMask, leftRect = _mask_rect(left)
+    rightMask, rightRect = _mask_rect(right)
+    return leftRect.colliderect(rightRect) and \
+        leftMask.overlap(rightMask, (rightRect.x - leftRect.x, rightRect.y - leftRect.y)) is not None
+
 class Sprite(pygame.sprite.Sprite): 
     
     def __init__(self, costumes,
@@ -35,6 +126,8 @@ class Sprite(pygame.sprite.Sprite):
         """
         Like Scratch, x,y is in the center of the sprite.
         Where that is may change based on the costume.
+        @param costumes An image file name or Surface, or a list of them, or
+               a dict of costume name -> image.
         """
         #TODO: separate from pygame groups
         self._stage = stage
@@ -44,7 +137,8 @@ class Sprite(pygame.sprite.Sprite):
         _idCounter += 1
         self._name = name if name else "sprite" + str(_idCounter)
         
-        self._costumes = []  #TODO ordered dictionary so we can lookup by name too
+        self._costumes = []
+        self._costumeNames = [] # in the same order
         self._costumeIndex = 0 #TODO does not exist yet
         self._image = None # set in _applyImage
         self._mask = None  #ditto
@@ -62,8 +156,22 @@ class Sprite(pygame.sprite.Sprite):
         
         #TODO
         self._draggable = False
-        self._sayThinkImages = None # images (right,left) when saying or thinking
+        self._bubble = None # _Bubble when saying or thinking
         self._debug = False
+        self._drawn = False # set on first _render
+        self._penDown = False
+        self._penColor = color.BLUE
+        self._penSize = 1
+        self._penPoints = [] # path since the last time it was drawn
+        self._effects = {} # effect name -> value
+        self._ghost = None # (image, alpha, see-through copy of it) for GHOST
+        self._animation = None # animation.Animation of AnimatedSprite
+        self._gridSpan = None # cells of the stage's camera grid it is in
+        self._volume = 100 # percent, for its sounds
+        self._pitch = 0 # sound pitch effect, 10 per semitone
+        self._static = False # may be baked into the stage's composite
+        self._baked = False  # drawn in the composite, not by itself
+        self._still = 0 # frames drawn without a change
     
         # Events
         self._on_click = EventCallback(self, None)
@@ -72,7 +180,10 @@ class Sprite(pygame.sprite.Sprite):
         self._on_tick = EventCallback(self, None)
         
         # TODO: have a mode to keep on screen
-        self._loadCostumes(costumes if isinstance(costumes, list) else [ costumes ])
+        if isinstance(costumes, dict):
+            self._loadCostumes(list(costumes.values()), list(costumes.keys()))
+        else:
+            self._loadCostumes(costumes if isinstance(costumes, list) else [ costumes ])
         #TODO: assert at least one costume
         
         #Easy way to position by topleft/topright instea
@@ -93,20 +204,51 @@ class Sprite(pygame.sprite.Sprite):
             t.cancel()
         self._backgroundTasks.clear()
         
-    def _loadCostumes(self, listOfImages):
-        for im in listOfImages:
+    def _loadCostumes(self, listOfImages, names=None):
+        for i, im in enumerate(listOfImages):
+            if names is not None:
+                name = names[i]
+            elif isinstance(im, str):
+                name = os.path.splitext(os.path.basename(im))[0]
+            else:
+                name = "costume" + str(len(self._costumes) + 1) # like Scratch
             if isinstance(im, str):
-                image = pygame.image.load(im)
-                image.convert(32, pygame.SRCALPHA)
-            elif isinstance(im, pygame.Surface):
-                image = im
-            self._costumes.append(image)
+                im = image.load(im)
+            self._costumes.append(image.normalize(im))
+            self._costumeNames.append(name)
+        if not image.display_ready():
+            image.when_display_ready(self)
         self.switch_costume_to(0)
         
+    def _normalize_images(self):
+        """
+        Called when the display exists, if costumes were loaded before.
+        """
+        self._costumes = [ image.normalize(im) for im in self._costumes ]
+        self._applyImage()
+        
     def _applyImage(self):
         """ Apply scales and transforms to original image, then set sprite vars """
         # These variables needed for sprite conventions
         self._image = orig = self._costumes[self._costumeIndex]
+        
+        diskKey = None
+        if self._effects:
+            self._image = effects.apply(orig, self._effects)
+        elif not self._drawn and diskcache.enabled():
+            # Setup before the first draw can come from the disk cache.  Later
+            # changes are usually animation, which is too frequent for disk.
+            diskKey = diskcache.transform_key(orig,
+                self._rotationStyle == LEFT_RIGHT and self._rotation >= 180,
+                self._rotation if self._rotationStyle == ALL_AROUND else 0,
+                self._scale)
+            cached = diskcache.load(diskKey)
+            if cached and cached[1] is not None:
+                self._image, self._mask = cached
+                self._rect = self._image.get_rect(center=(self._x, self._y))
+                self._placed()
+                return
+        
         if self._rotationStyle == LEFT_RIGHT and self._rotation >= 180:
             self._image = pygame.transform.flip(self._image, True, False)
         elif self._rotationStyle == ALL_AROUND and self._rotation:
@@ -119,9 +261,48 @@ class Sprite(pygame.sprite.Sprite):
             newSize = (int(r.width * self._scale), int(r.height * self._scale))
             self._image = pygame.transform.smoothscale(self._image, newSize)
 
-        self._image.set_colorkey(orig.get_colorkey()) 
+        self._image.set_colorkey(orig.get_colorkey(), pygame.RLEACCEL)
         self._mask = pygame.mask.from_surface(self._image)
         self._rect = self._image.get_rect(center=(self._x, self._y))
+        self._placed()
+        if diskKey is not None:
+            diskcache.store(diskKey, self._image, self._mask)
+        
+    def _moved(self):
+        """
+        Called after the position changes to move the rect and draw with
+        the pen.
+        """
+        self._rect = self._image.get_rect(center=(self._x, self._y))
+        self._placed()
+        if self._penDown:
+            self._add_pen_point()
+        
+    def _placed(self):
+        """
+        Called after the rect changes, to keep the stage's camera grid
+        up to date.
+        """
+        self._touched()
+        stage = self._stage
+        if stage is not None and stage._grid is not None:
+            stage._grid.move(self)
+        
+    def _bakeable(self, auto:bool) -> bool:
+        """ @return True if the stage may draw it into its cached image """
+        return (self._static or auto) and self._still >= STATIC_FRAMES \
+            and self._bubble is None and not self._debug and not self._on_tick._cb \
+            and effects.GHOST not in self._effects \
+            and type(self).update is Sprite.update # else it may have work each frame
+        
+    def _touched(self):
+        """
+        Called when anything about how the sprite is drawn changes, so
+        that a baked sprite is drawn by itself again.
+        """
+        self._still = 0
+        if self._baked:
+            self._stage._unbake(self)
         
     def _on_mouse_motion(self, event):
         if self._draggable:
@@ -150,9 +331,10 @@ class Sprite(pygame.sprite.Sprite):
         Run the async function in the background until completion or until
         this sprite is destroyed.
         """
-        task = asyncio.create_task(coroutine)
-        self._backgroundTasks.add(task)
-        task.add_done_callback(self._backgroundTasks.discard)
+        script = scheduler.spawn(coroutine, owner=self._stage)
+        self._backgroundTasks.add(script)
+        script.add_done_callback(self._backgroundTasks.discard)
+        return script
     
     #################################################
     ##                  MOTION
@@ -169,7 +351,7 @@ class Sprite(pygame.sprite.Sprite):
         dx = steps * math.cos(self._rotation * math.pi / 180)
         self._y += dy
         self._x += dx
-        self._rect = self._image.get_rect(center=(self._x, self._y))
+        self._moved()
         
     def turn(self, degrees:float):
         """
@@ -187,12 +369,12 @@ class Sprite(pygame.sprite.Sprite):
         @see scratchypy.random_position()
         @see scratchypy.mouse_pointer()
         """
-        self.goTo(position[0], position[1])
+        self.go_to(position[0], position[1])
         
     def go_to(self, x:float, y:float):
         self._x = x
         self._y = y
-        self._rect = self._image.get_rect(center=(self._x, self._y))
+        self._moved()
         
     def go_rect(self, **kwargs):
         """
@@ -201,28 +383,43 @@ class Sprite(pygame.sprite.Sprite):
         self._rect = self._image.get_rect(**kwargs)
         self._x = self._rect.centerx
         self._y = self._rect.centery
+        self._placed()
+        if self._penDown:
+            self._add_pen_point()
         
-    async def glide_to_and_wait(self, x:float, y:float, seconds:float):
-        nframes = get_window().fps * seconds
-        while nframes > 0:
-            # Recalculate each time in case another event moved us
-            dx = (x - self._x) / nframes
-            dy = (y - self._y) / nframes
-            self.change_x_by(dx)
-            self.change_y_by(dy)
-            nframes -= 1
-            await get_window().next_frame()
-        # When done, should be at final spot
-        self.go_to(x, y)
-        self._rect = self._image.get_rect(center=(self._x, self._y))
-        
+    async def glide_to_and_wait(self, x:float, y:float, seconds:float, easing="linear"):
+        """
+        Glide to the given x, y over some seconds, and return when there.
+        """
+        await self.glide_to(x, y, seconds, easing)
         
-    def glide_to(self, x:float, y:float, seconds:float):
+    def glide_to(self, x:float, y:float, seconds:float, easing="linear"):
         """
         Glide to the given x, y in the background without waiting.
-        @return The task object which can be waited on for completion.
+        @param easing How the speed changes along the way: "linear",
+               "ease_in", "ease_out", "ease_in_out", "sine" or a function
+               of 0..1 that returns 0..1.
+        @return A Tween which can be awaited for completion, or cancelled.
         """
-        return asyncio.create_task(self.glide_to_and_wait(x, y, seconds))
+        return self.tween("position", (x, y), seconds, easing)
+    
+    def tween(self, prop:str, target, seconds:float, easing="linear"):
+        """
+        Smoothly change a property to the target value over some seconds,
+        in the background.
+        @param prop "position" (with an (x, y) target), "x", "y",
+               "direction", "size", or the name of a graphic effect such as
+               "ghost".
+        @param easing As for glide_to().
+        @return A Tween which can be awaited for completion, or cancelled.
+        """
+        stage = self._stage if self._stage is not None else get_window().stage
+        frames = round(get_window().fps * seconds)
+        return stage._tweens.add(tween.Tween(self, prop, target, frames, easing))
+    
+    async def tween_and_wait(self, prop:str, target, seconds:float, easing="linear"):
+        "Similar to tween but returns when done"
+        await self.tween(prop, target, seconds, easing)
     
     async def glide_to_position_and_wait(self, position:Tuple[float,float], seconds:float):
         "Similar to glide_to_and_wait but with single position argument"
@@ -262,36 +459,36 @@ class Sprite(pygame.sprite.Sprite):
             
     def change_x_by(self, steps):
         self._x += steps
-        self._rect = self._image.get_rect(center=(self._x, self._y))
+        self._moved()
         
     def set_x_to(self, x):
         self._x = x  # TODO: snap to screen?
-        self._rect = self._image.get_rect(center=(self._x, self._y))
+        self._moved()
         
     def change_y_by(self, steps):
         self._y += steps
-        self._rect = self._image.get_rect(center=(self._x, self._y))
+        self._moved()
         
     def set_y_to(self, y):
         self._y = y
-        self._rect = self._image.get_rect(center=(self._x, self._y))
+        self._moved()
         
     def if_on_edge_bounce(self):
         """
         TODO: add padding
         """
-        winx,winy = get_window().size
-        if self._rect.left < 0:
-            self._x = self._rect.w / 2
+        edges = self._edges()
+        if self._rect.left < edges.left:
+            self._x = edges.left + self._rect.w / 2
             self.point_in_direction(-self.direction)
-        if self._rect.right >= winx:
-            self._x = winx - self.rect.w / 2
+        if self._rect.right >= edges.right:
+            self._x = edges.right - self.rect.w / 2
             self.point_in_direction(-self.direction)
-        if self._rect.top < 0:
-            self._y = self._rect.h / 2
+        if self._rect.top < edges.top:
+            self._y = edges.top + self._rect.h / 2
             self.point_in_direction(180-self.direction)
-        if self._rect.bottom >= winy:
-            self._y = winy - self._rect.h / 2
+        if self._rect.bottom >= edges.bottom:
+            self._y = edges.bottom - self._rect.h / 2
             self.point_in_direction(180-self.direction)
             
     def if_on_edge_snap(self, padding=0):
@@ -343,91 +540,55 @@ class Sprite(pygame.sprite.Sprite):
     ##                  LOOKS
     #################################################
 
-    def _make_bubble(self, speechText:str):
-        #render the text
-        font = pygame.font.SysFont("sans serif", 25)
-        bounds = pygame.Rect(0,0,320,320)
-        textSurf = scratchypy.text.render_text(font, speechText, bounds)
-        
-        # Draw the bubble - TODO-handle min sizes
-        textRect = textSurf.get_rect().move(4,4) #adjust so can inflate
-        bubbleRect = textRect.inflate(8,8)
-        
-        bubbleSurf = pygame.surface.Surface((bubbleRect.w, bubbleRect.h+10), pygame.SRCALPHA, 32)
-        pygame.draw.rect(bubbleSurf, color.WHITE, bubbleRect, width=0, border_radius=10)
-        pygame.draw.rect(bubbleSurf, color.BLACK, bubbleRect, width=1, border_radius=10)
-        bubbleSurf.blit(textSurf, textRect)
-        return bubbleSurf
+    def _set_bubble(self, bubbleText:str, kind:str):
+        if not bubbleText:
+            if self._bubble is not None:
+                self._bubble = None
+                self._touched()
+        elif self._bubble is None or self._bubble.key != (bubbleText, kind):
+            self._bubble = _get_bubble(bubbleText, kind)
+            self._touched()
+        # else saying the same thing again; nothing to do
 
     def say(self, speechText:str=None):
         """ 
         Will stay indefinitely or until another say/think.
         Say None or blank to clear bubble.
         """
-        if not speechText:
-            self._sayThinkImages = None
-            return
-        
-        right = self._make_bubble(speechText)
-        left = right.copy()
-        r = right.get_rect()
-        # draw tail for right orientation (left side)
-        points = [ (15, r.bottom-11),
-                   (10, r.bottom),
-                   (22, r.bottom-11) ]
-        pygame.draw.polygon(right, color.WHITE, points, width=0)
-        pygame.draw.lines(right, color.BLACK, False, points, width=1)
-        # draw tail for left orientation (right side)
-        points = [(r.right-x, y) for x,y in points]
-        pygame.draw.polygon(left, color.WHITE, points, width=0)
-        pygame.draw.lines(left, color.BLACK, False, points, width=1)
-        # set it
-        self._sayThinkImages = (right, left)
+        self._set_bubble(speechText, _SAY)
         
     async def say_and_wait(self, speechText:str, howManySeconds:float):
         self.say(speechText)
-        await asyncio.sleep(howManySeconds)
-        self._sayThinkImages = None
+        await wait(howManySeconds)
+        self._set_bubble(None, _SAY)
         
     def think(self, thoughtText:str):
         """ 
         Will stay indefinitely or until another say/think.
         Say None or blank to clear bubble.
         """
-        if not thoughtText:
-            self._sayThinkImages = None
-            return
-        
-        right = self._make_bubble(thoughtText)
-        left = right.copy()
-        r = right.get_rect()
-        # right side (left bubbles) 
-        pygame.draw.circle(right, color.WHITE, (16, r.bottom-9), 4, width=0)
-        pygame.draw.circle(right, color.BLACK, (16, r.bottom-9), 4, width=1)
-        pygame.draw.circle(right, color.WHITE, (11, r.bottom-4), 2, width=0)
-        pygame.draw.circle(right, color.BLACK, (11, r.bottom-4), 2, width=1)
-        # left side (right bubbles) 
-        pygame.draw.circle(left, color.WHITE, (r.right-16, r.bottom-9), 4, width=0)
-        pygame.draw.circle(left, color.BLACK, (r.right-16, r.bottom-9), 4, width=1)
-        pygame.draw.circle(left, color.WHITE, (r.right-11, r.bottom-4), 2, width=0)
-        pygame.draw.circle(left, color.BLACK, (r.right-11, r.bottom-4), 2, width=1)
-        # set it
-        self._sayThinkImages = (right, left)
+        self._set_bubble(thoughtText, _THINK)
         
     async def think_and_wait(self, thoughtText:str, howManySeconds:float):
         self.think(thoughtText)
-        await asyncio.sleep(howManySeconds)
-        self._sayThinkImages = None
+        await wait(howManySeconds)
+        self._set_bubble(None, _SAY)
     
-    def switch_costume_to(self, index:int):
+    def switch_costume_to(self, index:Union[int,str]):
         """
-        TODO: support switch by name (file name?)
-        @param number The index (number) of the costume to select.
+        @param index The index (number) of the costume to select.
                       Remember, in Python, counting starts at 0, 1, 2, ...
+                      Or the name of the costume, which is the file name
+                      without the extension, or the key when costumes were
+                      given as a dict, e.g. from image.load_sheet_json().
         """
         if not self._costumes:
             return #BOOM
-        if index < 0 or index > len(self._costumes):
+        if isinstance(index, str):
+            if index not in self._costumeNames:
+                return # like Scratch, ignore unknown names
+            index = self._costumeNames.index(index)
+        if index < 0 or index >= len(self._costumes):
             index = 0
         self._costumeIndex = index
         self._applyImage()
@@ -453,13 +614,53 @@ class Sprite(pygame.sprite.Sprite):
         self._scale = percent/100
         self._applyImage()
     
-    #TODO: color effects
+    def set_effect_to(self, effect:str, value:float):
+        """
+        Set a graphic effect, like Scratch.
+        @param effect One of 'color', 'fisheye', 'whirl', 'pixelate',
+               'mosaic', 'brightness', 'ghost'.  See the effects module.
+        @param value The amount, where 0 means no effect.  Ghost is 0..100
+               (invisible), brightness is -100..100, and color wraps at 200.
+        """
+        effect = effects.check_name(effect)
+        value = effects.clamp(effect, value)
+        if self._effects.get(effect, 0) == value:
+            return # nothing to redo
+        if value:
+            self._effects[effect] = value
+        else:
+            self._effects.pop(effect, None)
+        if effect == effects.GHOST:
+            # just the transparency when drawn; no need to redo pixels
+            self._touched()
+        else:
+            self._applyImage()
+        
+    def change_effect_by(self, effect:str, value:float):
+        """
+        Change a graphic effect by the amount.  See set_effect_to().
+        """
+        effect = effects.check_name(effect)
+        self.set_effect_to(effect, self._effects.get(effect, 0) + value)
+        
+    def get_effect(self, effect:str) -> float:
+        """ @return the current amount of the graphic effect. """
+        return self._effects.get(effects.check_name(effect), 0)
+        
+    def clear_graphic_effects(self):
+        if self._effects:
+            self._effects = {}
+            self._applyImage()
         
     def show(self):
-        self._visible = True
+        if not self._visible:
+            self._visible = True
+            self._touched()
         
     def hide(self):
-        self._visible = False
+        if self._visible:
+            self._visible = False
+            self._touched()
         
     #TODO layers
     
@@ -469,7 +670,7 @@ class Sprite(pygame.sprite.Sprite):
     
     @property
     def costume_name(self) -> str:
-        return "TODO: implement me"
+        return self._costumeNames[self._costumeIndex]
     
     # backdrop on stage
     
@@ -480,6 +681,46 @@ class Sprite(pygame.sprite.Sprite):
         """
         return self._scale * 100
     
+    # Sound
+    
+    def start_sound(self, soundFile, priority:int=0):
+        """
+        Start playing a sound with this sprite's volume and pitch, and
+        continue right away.  See the sound module.
+        @return the pygame Channel playing it, or None if it could not play.
+        """
+        return sound.start_sound(soundFile, self._volume, self._pitch, priority)
+    
+    async def play_sound_until_done(self, soundFile, priority:int=0):
+        await sound.play_sound_until_done(soundFile, self._volume, self._pitch, priority)
+    
+    def stop_all_sounds(self):
+        sound.stop_all_sounds()
+    
+    def set_volume_to(self, percent:float):
+        """ Volume of sounds started after this, 0 to 100 """
+        self._volume = min(max(percent, 0), 100)
+    
+    def change_volume_by(self, percent:float):
+        self.set_volume_to(self._volume + percent)
+    
+    @property
+    def volume(self) -> float:
+        return self._volume
+    
+    def set_pitch_effect_to(self, value:float):
+        """
+        Pitch of sounds started after this, 10 is a semitone higher and
+        -120 an octave lower, like Scratch.  Limited to -360 to 360.
+        """
+        self._pitch = min(max(value, -360), 360)
+    
+    def change_pitch_effect_by(self, value:float):
+        self.set_pitch_effect_to(self._pitch + value)
+    
+    def clear_sound_effects(self):
+        self._pitch = 0
+    
     def go_to_front_layer(self):
         """
         Move this sprite on top of all other sprites.
@@ -508,6 +749,74 @@ class Sprite(pygame.sprite.Sprite):
     ##                  SOUND - should be a separate module
     #################################################
     
+    #################################################
+    ##                  PEN
+    #################################################
+    
+    def _add_pen_point(self):
+        if self._stage is not None:
+            self._stage._penSprites.add(self) # draw me next frame
+        self._penPoints.append((self._x, self._y))
+        
+    def _draw_pen(self, surface):
+        """
+        Draw the path moved since last time onto the stage's pen surface as
+        a single lines() call.  The last point is kept to continue from.
+        """
+        points = self._penPoints
+        if not points:
+            return
+        if len(points) == 1 or self._penSize > 2:
+            # a dot when not moving, and round joints for thick lines
+            radius = self._penSize / 2
+            for p in (points if len(points) > 1 else points[:1]):
+                pygame.draw.circle(surface, self._penColor, p, radius)
+        if len(points) > 1:
+            pygame.draw.lines(surface, self._penColor, False, points, self._penSize)
+        self._penPoints = [points[-1]] if self._penDown else []
+        
+    def _flush_pen(self):
+        "Draw any pending path now, e.g. before the pen changes."
+        if self._penPoints and self._stage is not None:
+            self._draw_pen(self._stage._pen_surface())
+    
+    def pen_down(self):
+        """
+        Start drawing a line wherever this sprite moves.  The line stays on the
+        stage, behind all sprites, until the stage's erase_all().
+        """
+        if not self._penDown:
+            self._penDown = True
+            self._add_pen_point()
+        
+    def pen_up(self):
+        "Stop drawing lines when moving."
+        self._flush_pen()
+        self._penDown = False
+        self._penPoints = []
+        
+    def set_pen_color_to(self, penColor):
+        self._flush_pen()
+        self._penColor = pygame.Color(penColor)
+        
+    def set_pen_size_to(self, size:float):
+        self._flush_pen()
+        self._penSize = max(1, int(round(size)))
+        
+    def change_pen_size_by(self, change:float):
+        self.set_pen_size_to(self._penSize + change)
+        
+    def stamp(self):
+        """
+        Draw the sprite's current look onto the stage's pen layer.  It stays
+        there even when the sprite moves away, and costs nothing extra to
+        draw, no matter how many stamps there are.
+        """
+        if self._stage is None:
+            return
+        self._flush_pen()
+        self._stage._pen_surface().blit(self._shown_image(), self._rect)
+    
     #################################################
     ##                  EVENTS
     #################################################
@@ -586,6 +895,7 @@ class Sprite(pygame.sprite.Sprite):
     #################################################
     def forever(self, functionToCall):
         self._on_tick.set(functionToCall)
+        self._touched() # needs its ticks
         
     def clone(self, name=None, stage=None):
         """
@@ -606,6 +916,15 @@ class Sprite(pygame.sprite.Sprite):
         _idCounter += 1
         newObj._name = name if name else "sprite" + str(_idCounter)
         newObj._costumes = self._costumes.copy()
+        newObj._costumeNames = self._costumeNames.copy()
+        newObj._penPoints = [(self._x, self._y)] if self._penDown else []
+        newObj._effects = self._effects.copy()
+        newObj._gridSpan = None
+        newObj._baked = False
+        if self._animation is not None:
+            newObj._animation = self._animation.clone(newObj)
+        if not image.display_ready():
+            image.when_display_ready(newObj)
         if stage is not None:
             stage.add(newObj)
         # Clone all handlers and handler dictionaries
@@ -629,34 +948,98 @@ class Sprite(pygame.sprite.Sprite):
             * An (x,y) position tuple
             * A pygame.color.Color (but can't be an RGB tuple)
             * Sprite.EDGE to mean the screen edge.
+            * A TileMap - its solid tiles, using the sprite's rectangle
         """
         if isinstance(what, pygame.sprite.Sprite):
-            return pygame.sprite.collide_mask(self, what) is not None
+            return _collide_mask(self, what)
         elif isinstance(what, pygame.sprite.Group):
-            return len(pygame.sprite.spritecollideany(self, what, pygame.sprite.collide_mask)) > 0
+            return pygame.sprite.spritecollideany(self, what, _collide_mask) is not None
         elif isinstance(what, tuple):  #coordinates
             try:
                 return 1 == self._mask.get_at(what[0]-self._rect.left, what[1]-self._rect.top)
             except: # way out of bounds.. TODO optimize no exception?
                 return False
-        elif isinstance(pygame.color.Color):
+        elif isinstance(what, pygame.color.Color):
             return self.touching_color(what)
+        elif isinstance(what, tilemap.TileMap):
+            return what.touching(self._rect)
         else: #assume EDGE
             return self.touching_edge()
         
     def touching_edge(self):
         #TODO: the mask may not necessarily go to the bounding rectangle
-        w, h = get_window().size
-        return self._rect.left < 0 \
-            or self._rect.top < 0 \
-            or self._rect.right >= w \
-            or self._rect.bottom >= h
+        edges = self._edges()
+        return self._rect.left < edges.left \
+            or self._rect.top < edges.top \
+            or self._rect.right >= edges.right \
+            or self._rect.bottom >= edges.bottom
     
-    def touching_color(self, color):
-        raise NotImplementedError()
-        #TODO... how
+    def _edges(self) -> pygame.Rect:
+        """
+        @return the world's bounds if the stage camera has one, else the
+                window's, or the layer's if the stage is a Layer.
+        """
+        stage = self._stage
+        if stage is None:
+            return get_window().rect
+        if stage._camera is not None and stage._camera.world is not None:
+            return stage._camera.world
+        return pygame.Rect((0, 0), stage._canvas_size())
     
-    #TODO: color is touching color??
+    def _color_mask(self, surface, color, tolerance):
+        """
+        @return a Mask of the pixels in surface that are within tolerance of
+                color, for each of red, green and blue.
+        """
+        threshold = (tolerance+1, tolerance+1, tolerance+1, 255)
+        return pygame.mask.from_threshold(surface, color, threshold)
+    
+    def _below_region(self):
+        """
+        @return (surface, offset) of the stage drawn beneath this sprite,
+                clipped to this sprite's rect, with the offset of that region
+                from the sprite's top left.  None if not on a stage or not
+                within the window.
+        """
+        if self._stage is None:
+            return None
+        below = self._stage._layers_below(self)
+        rect = self._rect.move(self._stage._screen_offset())
+        region = rect.clip(below.get_rect())
+        if not region.w or not region.h:
+            return None
+        offset = (region.x - rect.x, region.y - rect.y)
+        return (below.subsurface(region), offset)
+        
+    def touching_color(self, color, tolerance:int=8):
+        """
+        @return True if this sprite is over the given color on the stage:
+                the backdrop or sprites behind this one.
+        @param color A pygame.Color or (r,g,b) tuple.
+        @param tolerance How far off each of red, green, and blue may be and
+               still match, 0..255.  Like Scratch, colors very close to the
+               given one count by default.
+        """
+        found = self._below_region()
+        if found is None:
+            return False
+        region, offset = found
+        colorMask = self._color_mask(region, color, tolerance)
+        return self._mask.overlap(colorMask, offset) is not None
+    
+    def color_is_touching_color(self, myColor, otherColor, tolerance:int=8):
+        """
+        @return True if a part of this sprite that is myColor is over
+                otherColor on the stage (the backdrop or sprites behind).
+        @see touching_color() for the tolerance.
+        """
+        found = self._below_region()
+        if found is None:
+            return False
+        region, offset = found
+        # only the visible pixels of this sprite that are myColor
+        mine = self._color_mask(self._image, myColor, tolerance).overlap_mask(self._mask, (0,0))
+        return mine.overlap(self._color_mask(region, otherColor, tolerance), offset) is not None
     
     def distance_to(self, what):
         """
@@ -723,26 +1106,84 @@ class Sprite(pygame.sprite.Sprite):
     #################################################
     def set_debug(self, onoff=True):
         self._debug = onoff
+        self._touched()
         
-    def _render(self, screen):
+    def set_static(self, static:bool=True):
+        """
+        Say that this sprite doesn't change, like scenery or a label, so that
+        the stage draws it into a cached image together with the static
+        sprites next to it in layer order, and skips it every frame.  Moving
+        it or changing how it looks draws it by itself again, until it has
+        stayed the same for a while.  It can still be clicked and touched.
+        Sprites with a forever() handler, a speech bubble, the ghost effect
+        or debug drawing are not cached, nor ones of a class with its own
+        update().
+        See also Stage.set_auto_static().
+        """
+        self._static = static
+        self._still = STATIC_FRAMES if static else 0
+        if self._baked:
+            self._stage._unbake(self)
+        elif self._stage is not None:
+            self._stage._drawList = None
+    
+    @property
+    def static(self) -> bool:
+        """ @return True if set_static() was called """
+        return self._static
+    
+    @property
+    def baked(self) -> bool:
+        """ @return True if drawn in the stage's cached image right now """
+        return self._baked
+        
+    def _render(self, screen, offset=None):
+        """
+        @param offset (dx, dy) from world to screen coordinates when the
+               stage has a camera.
+        """
+        self._drawn = True
+        self._still += 1
+        if self._still == STATIC_FRAMES and self._stage is not None and \
+                (self._static or self._stage._autoStatic):
+            self._stage._drawList = None # bake it
         if self._visible:
-            screen.blit(self._image, self._rect)
-            if self._sayThinkImages:
-                bubbleRect = self._sayThinkImages[0].get_rect() # assume same size
+            rect = self._rect if offset is None else self._rect.move(offset)
+            image.check_blit(self._image, self._name)
+            screen.blit(self._shown_image(), rect)
+            if self._bubble:
+                bubbleRect = self._bubble.rect
                 # Y no higher than top of screen
-                bubbleY = max(0, self._rect.top - bubbleRect.h)
+                bubbleY = max(0, rect.top - bubbleRect.h)
                 # Bubble on right side if fits, else left
-                if self._rect.right + bubbleRect.w <= screen.get_size()[0]:
-                    r = bubbleRect.move(self._rect.right, bubbleY)
-                    screen.blit(self._sayThinkImages[0], r) #right
+                if rect.right + bubbleRect.w <= screen.get_size()[0]:
+                    r = bubbleRect.move(rect.right, bubbleY)
+                    screen.blit(self._bubble.side(_RIGHT), r)
                 else:
-                    r = bubbleRect.move(self._rect.left - bubbleRect.w, bubbleY)
-                    screen.blit(self._sayThinkImages[1], r) #left
+                    r = bubbleRect.move(rect.left - bubbleRect.w, bubbleY)
+                    screen.blit(self._bubble.side(_LEFT), r)
             if self._debug:
-                pygame.draw.rect(screen, color.BLUE, self._rect, width=1)
-                pygame.draw.line(screen, color.GREEN, (self._x-5, self._y), (self._x+5, self._y))
-                pygame.draw.line(screen, color.GREEN, (self._x, self._y-5), (self._x, self._y+5))
+                x, y = rect.center
+                pygame.draw.rect(screen, color.BLUE, rect, width=1)
+                pygame.draw.line(screen, color.GREEN, (x-5, y), (x+5, y))
+                pygame.draw.line(screen, color.GREEN, (x, y-5), (x, y+5))
     blit = _render #XXX
+    
+    def _shown_image(self):
+        """
+        @return the image to draw, made see-through by the ghost effect.
+                The copy is the sprite's own, since the image may be shared
+                with clones and caches.
+        """
+        alpha = effects.ghost_alpha(self._effects)
+        if alpha is None:
+            return self._image
+        ghost = self._ghost
+        if ghost is None or ghost[0] is not self._image or ghost[1] != alpha:
+            seeThrough = self._image.copy()
+            seeThrough.set_alpha(alpha)
+            ghost = self._ghost = (self._image, alpha, seeThrough)
+        return ghost[2]
         
     def update(self):
         """
@@ -775,7 +1216,7 @@ class TextSprite(Sprite):
         self._maxWidth = maxWidth
         self._color = color
         self._size = size
-        self._font = font if font else pygame.font.SysFont("sans serif", self._size)
+        self._font = font if font else scratchypy.text.get_font(size=self._size)
         self._topleft = topleft
         self._topright = topright
         self._justification = justification
@@ -791,7 +1232,7 @@ class TextSprite(Sprite):
     
     def set_text(self, text):
         surface = self._render_text(text)
-        self._costumes = [ surface ]
+        self._costumes = [ image.normalize(surface) ]
         self._applyImage()
         # readjust if we're justified
         if self._topleft:
@@ -806,43 +1247,93 @@ class AnimatedSprite(Sprite):
     one frame per costume.  Functions are provided for easy start
     and stop of the animation.  This sprite inherits from Sprite
     and you can still move it and do any other Sprite actions.
+    All the animations on a stage are moved along together by the stage,
+    and each costume is rotated and scaled only the first time it is shown,
+    so playing is cheap even with many animated sprites.
     """
-    def __init__(self, costumes, fps:int=5, x=0, y=0, name=None, size=None, stage=None):
+    LOOP = animation.LOOP
+    PING_PONG = animation.PING_PONG
+    ONCE = animation.ONCE
+    
+    def __init__(self, costumes, fps:float=5, x=0, y=0, name=None, size=None, stage=None,
+                 durations=None, mode:str=animation.LOOP):
         """
         @param costumes: List of frame/costume images.  See Sprite doc.
         @param fps: Frames Per Second you want the animation to play at,
                since e.g. a full 30 FPS is usually too fast for simple
-               animations.  Will be rounded to the nearest rate compatible
-               with the overall framerate.
-               
-        """
+               animations.  May be fractional, e.g. 2.5.
+        @param durations: Optional list of seconds to show each frame,
+               instead of the same for all from fps.
+        @param mode: LOOP, PING_PONG (forwards then backwards) or ONCE.
+        """
+        # costume index -> (image, mask) for the current rotation, size
+        # and effects
+        self._frameTable = {}
+        self._frameTableKey = None
         super().__init__(costumes, x=x, y=y, name=name, size=size, stage=stage)
-        FPS = get_window().fps
-        if fps <= 0 or fps > FPS:
-            raise ValueError("fps must be 1..FPS")
-        self._framesPerTick = FPS // fps
-        self._frameCounter = 0
-        self._playing = True
+        self._animation = animation.Animation(self, fps, durations, mode)
+        if self._stage is not None:
+            self._stage._animations.add(self._animation)
         
     def start(self):
-        self._playing = True
+        """
+        Play from where it is.
+        @return The animation, which can be awaited until it finishes.
+        """
+        self._animation.play()
+        return self._animation
         
     def pause(self):
-        self._playing = False
+        self._animation.pause()
         
     def stop(self, homeFrame = 0):
-        self._playing = False
+        self._animation.stop()
         self.switch_costume_to(homeFrame)
-    
-    def update(self):
+        
+    async def play_once_and_wait(self, homeFrame = 0):
         """
-        Called once per frame to do updates.
+        Play from the home frame to the last one, and return when done.
         """
-        super().update()
-        if self._playing:
-            self._frameCounter += 1
-            if self._frameCounter % self._framesPerTick == 0:
-                self.next_costume()
+        self._animation.set_mode(animation.ONCE)
+        self.switch_costume_to(homeFrame)
+        self._animation.restart()
+        await self._animation
+        
+    def set_fps(self, fps:float):
+        self._animation.set_rate(fps)
+        
+    def set_durations(self, durations):
+        """ @param durations A list of seconds to show each frame """
+        self._animation.set_rate(durations=durations)
+        
+    def set_mode(self, mode:str):
+        """ @param mode LOOP, PING_PONG or ONCE """
+        self._animation.set_mode(mode)
         
+    def _show_frame(self, index):
+        self._costumeIndex = index
+        self._applyImage()
+        
+    def _applyImage(self):
+        # Reuse the already transformed costume if nothing else changed
+        key = (self._rotation, self._rotationStyle, self._scale, tuple(sorted(self._effects.items())))
+        if key != self._frameTableKey:
+            self._frameTable.clear()
+            self._frameTableKey = key
+        frame = self._frameTable.get(self._costumeIndex)
+        if frame is None:
+            super()._applyImage()
+            self._frameTable[self._costumeIndex] = (self._image, self._mask)
+        else:
+            self._image, self._mask = frame
+            self._rect = self._image.get_rect(center=(self._x, self._y))
+            self._placed()
+        
+    def _normalize_images(self):
+        self._frameTable.clear()
+        super()._normalize_images()
         
-        
\ No newline at end of file
+    def clone(self, name=None, stage=None):
+        newObj = super().clone(name, stage)
+        newObj._frameTable = self._frameTable.copy()
+        return newObj
@@ -11,9 +11,93 @@ import pygame
 import asyncio
 from scratchypy.eventcallback import EventCallback
 import scratchypy.window 
+from scratchypy import image, tween, scheduler, animation, camera
 from scratchypy.text import AskDialog
 
 
+class _Backdrop:
+    """
+    One backdrop image.  The image is converted to the display's pixel format
+    so that full-screen blits are fast, and scaled copies are cached by size
+    so that switching back and forth or changing the window size does not
+    redo the work.
+    """
+    # Keep only a couple of sizes; e.g. windowed and full screen
+    MAX_SIZES = 2
+    
+    def __init__(self, name:str, source:Union[str,pygame.Surface]):
+        self.name = name
+        self._source = source # file name or original Surface
+        self._image = None # converted, unscaled
+        self._scaled = {}  # (w,h) -> Surface
+        
+    def _original(self):
+        if self._image is None:
+            im = self._source
+            if isinstance(im, str):
+                im = pygame.image.load(im)
+            if not image.display_ready():
+                return im # too early to convert; try again next time
+            self._image = image.normalize(im, opaque=True)
+        return self._image
+        
+    def surface(self, size):
+        """
+        @return the backdrop scaled to the (w,h) size.  TODO: may warp
+        """
+        scaled = self._scaled.get(size)
+        if scaled is None:
+            im = self._original()
+            scaled = im if im.get_size() == size else pygame.transform.smoothscale(im, size)
+            if self._image is not None:
+                while len(self._scaled) >= self.MAX_SIZES:
+                    del self._scaled[next(iter(self._scaled))] # oldest
+                self._scaled[size] = scaled
+        return scaled
+    
+    def evict(self):
+        """
+        Drop the cached images.  Images from a file are loaded again when
+        next needed; given Surfaces are kept since they can't be reloaded.
+        """
+        self._scaled.clear()
+        if isinstance(self._source, str):
+            self._image = None
+
+
+class _Baked:
+    """
+    A run of static sprites next to each other in layer order, drawn once
+    into a cached image just big enough for them.  Premultiplied alpha
+    makes drawing them in two steps look the same as one by one.
+    """
+    def __init__(self, sprites):
+        self.sprites = sprites
+        self._surface = None
+        self._rect = None
+        shown = [ sp for sp in sprites if sp._visible ]
+        if shown:
+            self._rect = shown[0]._rect.unionall([ sp._rect for sp in shown[1:] ])
+            self._surface = image.normalize(pygame.Surface(self._rect.size, pygame.SRCALPHA))
+            self._surface.fill((0, 0, 0, 0))
+            offset = (-self._rect.x, -self._rect.y)
+            for sp in shown:
+                if sp._image.get_flags() & pygame.SRCALPHA:
+                    self._surface.blit(sp._image.premul_alpha(), sp._rect.move(offset),
+                                       special_flags=pygame.BLEND_PREMULTIPLIED)
+                else: # opaque, maybe with a colorkey: same either way
+                    self._surface.blit(sp._image, sp._rect.move(offset))
+        for sp in sprites:
+            sp._baked = True
+    
+    def update(self):
+        pass # no ticks for static sprites
+    
+    def _render(self, screen):
+        if self._surface is not None:
+            screen.blit(self._surface, self._rect, special_flags=pygame.BLEND_PREMULTIPLIED)
+
+
 class Stage:
     '''
     A Stage is the main element that contains all the Sprites and dispatches
@@ -28,9 +112,11 @@ class Stage:
         self._sprites = []
         self._on_start = EventCallback(self, None, name="Stage.when_started")
         self._on_tick = EventCallback(self, None, name="Stage.each_tick")
-        # list of (name, surface) tuples
+        # list of _Backdrop, plus name -> index
         self._backdrops = []
+        self._backdropIndex = {}
         self._backdropId = -1 #TODO: gotta be one default
+        self._evictBackdrops = False
         self._name_lookup = {}
         self._on_click = EventCallback(self, None, name="Stage.when_clicked")
         self._allClickEvents = False
@@ -38,6 +124,30 @@ class Stage:
         self._keyHandlers = {}
         self._dialog = None
         self._draw_raw = EventCallback(self, None, name="Stage.when_drawing")
+        # (frame, layers drawn, surface) for touching_color
+        self._belowCache = None
+        # Pen layer, made on first use, and sprites with a path to draw
+        self._pen = None
+        self._penSprites = set()
+        self._penRevision = 0 # counts changes to the pen surface
+        # Glides and other tweens, advanced together each frame
+        self._tweens = tween.TweenEngine()
+        self._animations = animation.AnimationClock()
+        # Made on first use of the camera property, with a grid of sprites
+        # to find the ones in view, and sprite -> layer to draw them in order
+        self._camera = None
+        self._grid = None
+        self._order = None
+        # Sprites to draw in order, with runs of static ones as _Baked,
+        # made when needed, and the _Baked runs of it by their sprites
+        self._drawList = None
+        self._baked = {}
+        self._autoStatic = False
+        self._tilemaps = [] # drawn over the backdrop, bottom first
+        # Layers (substages) shown below and above the sprites, bottom first
+        self._layersBelow = []
+        self._layersAbove = []
+        self._started = False
         # call subclass init
         self.on_init()
         self._backgroundTasks = set()
@@ -54,17 +164,62 @@ class Stage:
         pass
         
     def _start(self):
+        self._started = True
         self._on_start()
+        for layer in self._layersBelow + self._layersAbove:
+            layer._start()
+        
+    def _warm_up(self, size):
+        """
+        Load and convert the backdrops, and scale the first one shown, so
+        that the first frame of the stage doesn't have to.
+        """
+        for bd in self._backdrops:
+            bd._original()
+        if self._backdropId >= 0:
+            self._backdrops[self._backdropId].surface(size)
+        
+    def suspend(self):
+        """
+        Pause the stage: its scripts, glides and animations stop where they
+        are, and continue from there on resume().  Window.set_stage() does
+        this to the stage it switches away from when asked to keep it.
+        """
+        scheduler.get_scheduler().suspend(self)
+        for layer in self._layersBelow + self._layersAbove:
+            layer.suspend()
+        
+    def resume(self):
+        scheduler.get_scheduler().resume(self)
+        for layer in self._layersBelow + self._layersAbove:
+            layer.resume()
+        
+    @property
+    def suspended(self) -> bool:
+        return scheduler.get_scheduler().suspended(self)
         
     def destroy(self):
         for t in self._backgroundTasks:
             t.cancel()
         self._backgroundTasks.clear()
+        # scripts of its event handlers and sprites too
+        scheduler.get_scheduler().cancel_owned(self)
+        for layer in self._layersBelow + self._layersAbove:
+            layer.destroy()
+        self._tweens.cancel_all()
+        self._animations.clear()
         
         for sp in self._sprites:
             sp._stage = None
+            sp._baked = False
             sp.destroy()
         self._sprites.clear() # break circular ref
+        self._order = None
+        self._drawList = None
+        self._baked.clear()
+        if self._grid is not None:
+            self._grid = camera.SpatialGrid()
+        self._penSprites.clear()
         
     def sprites(self):
         return self._sprites.copy()
@@ -73,17 +228,144 @@ class Stage:
         """
         Draw everything.  TODO: draw only what changed.
         """
+        cam = self._camera
+        if cam is not None:
+            # move everything first, so a followed sprite isn't a frame behind
+            self._advance()
+            self._tick_in_view(cam)
+            cam._update(screen.get_size())
         if self._backdropId >= 0:
-            screen.blit(self._backdrops[self._backdropId][1], (0,0))
-        self._on_tick()
-        for sprite in self._sprites:
-            sprite.update()
-            sprite._render(screen)
+            screen.blit(self._backdrops[self._backdropId].surface(screen.get_size()), (0,0))
+        if self._tilemaps:
+            view = cam.view if cam is not None else screen.get_rect()
+            for tilemap in self._tilemaps:
+                tilemap._render(screen, view, self._screen_offset())
+        if self._penSprites:
+            pen = self._pen_surface()
+            for sprite in self._penSprites:
+                sprite._draw_pen(pen)
+            self._penSprites.clear()
+        if self._pen is not None:
+            screen.blit(self._pen, self._screen_offset())
+        for layer in self._layersBelow:
+            layer._composite(screen, self._screen_offset())
+        if cam is None:
+            self._advance()
+            for sprite in self._draw_list():
+                sprite.update()
+                sprite._render(screen)
+        else:
+            self._render_in_view(screen, cam)
+        for layer in self._layersAbove:
+            layer._composite(screen, self._screen_offset())
         self._draw_raw(screen)
         if self._dialog:
             self._dialog._render(screen)
             
             
+    def _advance(self):
+        """ Glides, animations and the stage's tick, once per frame """
+        self._tweens.step()
+        self._animations.step(scratchypy.window.Window.FRAME_SEC)
+        self._on_tick()
+            
+    def _in_view(self, view):
+        """ @return the sprites in the view, from the grid, in layer order """
+        order = self._layer_order()
+        inView = [sp for sp in self._grid.query(view) if sp._rect.colliderect(view)]
+        inView.sort(key=order.__getitem__)
+        return inView
+            
+    def _tick_in_view(self, cam):
+        """
+        Ticks go to all sprites, or with pause_offscreen only to those the
+        camera saw last frame, before it moves.
+        """
+        for sprite in self._in_view(cam.view) if cam.pause_offscreen else self._sprites:
+            sprite.update()
+            
+    def _render_in_view(self, screen, cam):
+        """
+        Draw only the sprites the camera sees, found from the grid, in layer
+        order.
+        """
+        offset = cam._offset
+        for sprite in self._in_view(cam.view):
+            sprite._render(screen, offset)
+            
+    def _draw_list(self):
+        """
+        @return the sprites to draw in layer order, with each run of
+                static sprites that stayed the same replaced by a _Baked.
+                Runs that didn't change are kept from last time.
+        """
+        if self._drawList is None:
+            drawList = []
+            baked = {}
+            run = []
+            for sp in self._sprites + [None]:
+                if sp is not None and sp._bakeable(self._autoStatic):
+                    run.append(sp)
+                    continue
+                if run:
+                    key = tuple(run)
+                    baked[key] = self._baked.get(key) or _Baked(key)
+                    drawList.append(baked[key])
+                    run = []
+                if sp is not None:
+                    sp._baked = False
+                    drawList.append(sp)
+            self._drawList = drawList
+            self._baked = baked
+        return self._drawList
+    
+    def _unbake(self, sprite):
+        """ Called when a baked sprite changes, to draw it by itself again """
+        key = next((key for key in self._baked if sprite in key), None)
+        if key is None:
+            sprite._baked = False # e.g. baked on another stage
+            return
+        for sp in self._baked.pop(key).sprites:
+            sp._baked = False
+        self._drawList = None
+    
+    def set_auto_static(self, auto:bool=True):
+        """
+        Cache any sprite that stays the same for a while, as if
+        set_static() was called on it, e.g. for scenes with a lot of
+        scenery.  Not done with a camera, which draws only what it sees.
+        """
+        self._autoStatic = auto
+        self._drawList = None
+    
+    def _canvas_size(self):
+        """ @return the (w, h) the stage draws on; a Layer's is its own """
+        return scratchypy.window.get_window().size
+    
+    def _layer_order(self):
+        """ @return a dict of sprite -> drawing order, made when needed """
+        if self._order is None:
+            self._order = { sp: i for i, sp in enumerate(self._sprites) }
+        return self._order
+    
+    def _screen_offset(self):
+        """ @return (dx, dy) from world to window coordinates """
+        return self._camera._offset if self._camera is not None else (0, 0)
+    
+    @property
+    def camera(self) -> camera.Camera:
+        """
+        The camera showing part of a world bigger than the window.  It is
+        made the first time this is used; until then the world is the window.
+        @see scratchypy.camera
+        """
+        if self._camera is None:
+            self._camera = camera.Camera(scratchypy.window.get_window().size)
+            self._grid = camera.SpatialGrid()
+            for sp in self._sprites:
+                self._grid.move(sp)
+        return self._camera
+            
     def _on_mouse_down(self, event):
         #TODO: distinguish click vs. drag
         pass
@@ -92,6 +374,21 @@ class Stage:
         for sp in self._sprites:
             if sp._draggable:
                 sp._on_mouse_motion(event)
+        for layer, local in self._layer_events(event):
+            layer._on_mouse_motion(local)
+                
+    def _layer_events(self, event):
+        """
+        @return (layer, event) for the layers under the event's position,
+                with the position moved to be within the layer.
+        """
+        found = []
+        for layer in reversed(self._layersBelow + self._layersAbove):
+            rect = layer.rect
+            if rect.collidepoint(event.pos):
+                local = dict(event.dict, pos=(event.pos[0] - rect.x, event.pos[1] - rect.y))
+                found.append((layer, pygame.event.Event(event.type, local)))
+        return found
                 
     def _on_mouse_up(self, event):
         "A click happens on mouse up"
@@ -100,16 +397,19 @@ class Stage:
             return # Don't handle right clicks now
         # Find the sprite(s) that has the position
         handled = False
+        pos = self._camera.to_world(event.pos) if self._camera is not None else event.pos
         for sp in self._sprites:
-            spPos = (int(event.pos[0] - sp._rect.left), int(event.pos[1] - sp._rect.top))
+            spPos = (int(pos[0] - sp._rect.left), int(pos[1] - sp._rect.top))
             #TODO: check for mask hit or is rect enough?
-            if sp._rect.collidepoint(event.pos) and sp._mask.get_at(spPos) == 1:
+            if sp._rect.collidepoint(pos) and sp._mask.get_at(spPos) == 1:
                 handled=True
                 # Hit - call the sprite's handler
                 sp._on_click(spPos) # Todo: what params to pass?
+        for layer, local in self._layer_events(event):
+            layer._on_mouse_up(local)
         # send event to the stage if registered
         if self._on_click and (self._allClickEvents or not handled):
-            self._on_click(event.pos)
+            self._on_click(pos)
             
     def _on_key_down(self, event):
         if self._dialog:
@@ -122,28 +422,24 @@ class Stage:
         # Pass to sprites too
         for sp in self._sprites:
             sp._on_key_down(event)
+        for layer in self._layersBelow + self._layersAbove:
+            layer._on_key_down(event)
             
     def add_backdrop(self, image:Union[str,pygame.Surface], name:str=None):
         """
         Add a background image to the stage.  If this is the first
         one added, it will be automatically switched to.
+        The image is converted to the display format and scaled to the window
+        the first time it is drawn, so adding many backdrops is cheap.
         @param image Either a filename or an already converted Surface
         @param name (optional) A name to use for this backdrop.  If omitted,
                then a name is generated from its 0-based index.
         """
-        if isinstance(image, str):
-            im = pygame.image.load(image)
-            im.convert()
-            #TODO: scale image to window
-        elif isinstance(image, pygame.Surface):
-            im = image
-        else:
+        if not isinstance(image, (str, pygame.Surface)):
             raise TypeError("I don't know what this backdrop is")
-        # Resize to screen.  TODO: may warp
-        im = pygame.transform.smoothscale(im, scratchypy.window.get_window().size)
-        
         name = name if name else "backdrop" + str(len(self._backdrops))
-        self._backdrops.append((name, im))
+        self._backdropIndex.setdefault(name, len(self._backdrops))
+        self._backdrops.append(_Backdrop(name, image))
         if self._backdropId < 0:
             self.switch_backdrop_to(0)
         
@@ -160,6 +456,40 @@ class Stage:
         for k,v in kwBackdrops.items():
             self.add_backdrop(v, name=k)
     
+    def add_layer(self, layer, below:bool=False):
+        """
+        Show a Layer, a substage drawn into a surface of its own.
+        @param below If True, show it under the sprites instead of over
+               them.  Later layers go on top of earlier ones.
+        @return the layer
+        @see scratchypy.layer
+        """
+        (self._layersBelow if below else self._layersAbove).append(layer)
+        if self._started:
+            layer._start()
+        return layer
+    
+    def remove_layer(self, layer):
+        """ Stop showing a layer.  It is kept as it is, to add again. """
+        for layers in (self._layersBelow, self._layersAbove):
+            if layer in layers:
+                layers.remove(layer)
+    
+    def layers(self):
+        """ @return the layers, from the bottom """
+        return self._layersBelow + self._layersAbove
+    
+    def add_tilemap(self, tilemap):
+        """
+        Add a TileMap, drawn over the backdrop and behind the pen and all
+        sprites.  Several can be added as layers, the first at the bottom.
+        @see scratchypy.tilemap
+        """
+        self._tilemaps.append(tilemap)
+        
+    def remove_tilemap(self, tilemap):
+        self._tilemaps.remove(tilemap)
+    
     def add(self, *sprites):
         # overrides Group impl to also track names
         # TODO: handle collisions?
@@ -167,10 +497,27 @@ class Stage:
             self._name_lookup[sp.name] = sp
             self._sprites.append(sp)
             sp._stage = self
+            sp._baked = False
+            self._order = None
+            self._drawList = None
+            if self._grid is not None:
+                self._grid.move(sp)
+            if sp._animation is not None:
+                self._animations.add(sp._animation)
             
     def remove(self, sprite):
         try:
             sprite._stage = None  #TODO: what if already moved to a new stage?
+            self._penSprites.discard(sprite)
+            self._tweens.cancel_sprite(sprite)
+            if self._grid is not None:
+                self._grid.remove(sprite)
+            self._order = None
+            if sprite._baked:
+                self._unbake(sprite)
+            self._drawList = None
+            if sprite._animation is not None:
+                self._animations.discard(sprite._animation)
             self._sprites.remove(sprite)
             del self._name_lookup[sprite.name]
         except (ValueError, KeyError):
@@ -180,11 +527,11 @@ class Stage:
         """
         Run the async function in the background until completion or until
         this stage is destroyed.
-        TODO: cancel tasks on stage destroy
         """
-        task = asyncio.create_task(coroutine)
-        self._backgroundTasks.add(task)
-        task.add_done_callback(self._backgroundTasks.discard)
+        script = scheduler.spawn(coroutine, owner=self)
+        self._backgroundTasks.add(script)
+        script.add_done_callback(self._backgroundTasks.discard)
+        return script
         
     #################################################
     ##                  LOOKS
@@ -193,7 +540,7 @@ class Stage:
     def backdrop_name(self) -> str:
         if self._backdropId < 0:
             return "(default)"
-        
+        return self._backdrops[self._backdropId].name
     
     @property
     def backdrop_number(self) -> int:
@@ -204,18 +551,39 @@ class Stage:
     
     def switch_backdrop_to(self, nameOrIndex:Union[str,int]):
         if isinstance(nameOrIndex, str):
-            for idx, bdTup in enumerate(self._backdrops):
-                if bdTup[0] == nameOrIndex:
-                    self._backdropId = idx
-            else:
+            idx = self._backdropIndex.get(nameOrIndex)
+            if idx is None:
                 raise KeyError("No backdrop named " + nameOrIndex)
+            self._set_backdrop(idx)
         elif isinstance(nameOrIndex, int):
             if nameOrIndex < 0 or nameOrIndex >= len(self._backdrops):
                 raise IndexError("No backdrop at (0-based) index %d" % nameOrIndex)
-            self._backdropId = nameOrIndex
+            self._set_backdrop(nameOrIndex)
         else:
             raise TypeError("Unknown backdrop id")
         
+    def _set_backdrop(self, idx:int):
+        """
+        All backdrop switches go through here so that the one switched away
+        from can be evicted if asked for.
+        """
+        if self._evictBackdrops and self._backdropId >= 0 and idx != self._backdropId:
+            self._backdrops[self._backdropId].evict()
+        self._backdropId = idx
+        
+    def set_backdrop_eviction(self, evict:bool=True):
+        """
+        [ADVANCED] If True, backdrops loaded from files are dropped from memory
+        when switched away from, and loaded again when switched back.  This
+        saves memory for stages with many large backdrops, at the cost of a
+        short pause on each switch.
+        """
+        self._evictBackdrops = evict
+        if evict:
+            for idx, bd in enumerate(self._backdrops):
+                if idx != self._backdropId:
+                    bd.evict()
+        
     async def switch_backdrop_and_wait(self):
         # TODO: should switch, call any callbacks for when switched, and return
         # that callback's future.
@@ -223,18 +591,80 @@ class Stage:
         
     def next_backdrop(self):
         if self._backdrops:
-            self._backdropId = (self._backdropId + 1) % len(self._backdrops)
+            self._set_backdrop((self._backdropId + 1) % len(self._backdrops))
             
     def previous_backdrop(self):
         if self._backdrops:
-            if self._backdropId < 0:
-                self._backdropId = 0 # so it will roll to last image below
-            self._backdropId = (self._backdropId - 1) % len(self._backdrops)
+            # from -1 (none), rolls to the last image
+            self._set_backdrop((max(self._backdropId, 0) - 1) % len(self._backdrops))
             
     def random_backdrop(self):
         if self._backdrops:
-            self._backdropId = random.randint(0, len(self._backdrops))
+            self._set_backdrop(random.randrange(len(self._backdrops)))
             
+    def _layers_below(self, sprite) -> pygame.Surface:
+        """
+        Used by the color sensing methods of sprites.
+        @return a window-sized surface with the backdrop, the pen layer, the
+                layers below the sprites and all the visible sprites behind
+                the given sprite drawn on it.
+        The surface is kept for the rest of the frame and built up as needed,
+        so that many sprites sensing colors in the same frame share the work,
+        especially when asked from bottom to top.
+        """
+        window = scratchypy.window.get_window()
+        idx = self._sprites.index(sprite)
+        cache = self._belowCache
+        if cache is None or cache[0] != window.frame_number or cache[1] > idx \
+                or cache[2].get_size() != window.size:
+            surface = image.normalize(pygame.Surface(window.size), opaque=True)
+            surface.fill(window._backgroundColor)
+            if self._backdropId >= 0:
+                surface.blit(self._backdrops[self._backdropId].surface(window.size), (0,0))
+            view = self._camera.view if self._camera is not None else surface.get_rect()
+            for tilemap in self._tilemaps:
+                tilemap._render(surface, view, self._screen_offset())
+            if self._pen is not None:
+                surface.blit(self._pen, self._screen_offset())
+            for layer in self._layersBelow:
+                if layer._surface is not None: # drawn already
+                    layer._show(surface, self._screen_offset())
+            drawn = 0
+        else:
+            _, drawn, surface = cache
+        offset = self._screen_offset()
+        for sp in self._sprites[drawn:idx]:
+            if sp._visible:
+                surface.blit(sp._image, sp._rect.move(offset))
+        self._belowCache = (window.frame_number, idx, surface)
+        return surface
+        
+    def _pen_surface(self) -> pygame.Surface:
+        """
+        @return the transparent, window-sized surface that the pen draws and
+                stamps on.  It is drawn between the backdrop and the sprites.
+        """
+        self._penRevision += 1 # asked for to draw on it
+        size = self._canvas_size()
+        if self._pen is None or self._pen.get_size() != size:
+            old = self._pen
+            self._pen = image.normalize(pygame.Surface(size, pygame.SRCALPHA))
+            self._pen.fill((0,0,0,0))
+            if old is not None:
+                self._pen.blit(old, (0,0))
+        return self._pen
+        
+    def erase_all(self):
+        """
+        Erase everything drawn with the pen or stamped.
+        """
+        self._pen = None
+        self._penRevision += 1
+        for sprite in self._penSprites:
+            sprite._penPoints = sprite._penPoints[-1:] if sprite._penDown else []
+        self._penSprites.clear()
+    clear = erase_all
+        
     def _sprite_move_layers(self, sprite:"Sprite", howmany:int):
         """
         Used by sprite layer methods to reorder the sprite in the stage's 
@@ -244,6 +674,8 @@ class Stage:
         newidx = idx + howmany
         newidx = min(len(self._sprites)-1, max(newidx, 0)) # clamp
         self._sprites.insert(newidx, self._sprites.pop(idx))
+        self._order = None
+        self._drawList = None
     
     #################################################
     ##                  EVENTS
@@ -273,6 +705,8 @@ class Stage:
         """
         When a any part of the stage is clicked, call the given handler
         If allClicks=True, this will be called even if there are sprites at this point too.
+        The handler is given the position clicked, in the world of the
+        camera if there is one, like mouse_pointer.
         """
         if not inspect.isfunction(handler):
             raise TypeError("callback is not a function")
@@ -283,6 +717,8 @@ class Stage:
     def broadcast(self, messageName, argDictionary={}, excludeOriginator=None):
         for sp in [sp for sp in self._sprites if sp is not excludeOriginator]:
             sp.message(messageName, argDictionary)
+        for layer in self._layersBelow + self._layersAbove:
+            layer.broadcast(messageName, argDictionary, excludeOriginator)
             
             
     #################################################
@@ -5,9 +5,59 @@ Helpers for rendering text.  Rarely needed to be used directly.
 """
 import re
 import asyncio
+import pygame.font
 import pygame.surface
 from scratchypy import color
 
+DEFAULT_FONT = "sans serif"
+
+# (family, size, bold, italic) -> pygame.font.Font
+_fonts = {}
+
+def init_font():
+    """
+    Initialize pygame's font module the first time text is used, rather than
+    at import.
+    """
+    if not pygame.font.get_init():
+        pygame.font.init()
+
+def get_font(family:str=DEFAULT_FONT, size:int=25, bold:bool=False, italic:bool=False) -> pygame.font.Font:
+    """
+    Get a font from the shared registry.  Looking up system fonts is slow
+    (it can even run an external program the first time), so each family and
+    size is only looked up once and the same Font object is shared by all
+    text, speech bubbles and prompts.
+    @param family A system font name like "sans serif" or "serif", or the path
+           of a font file (.ttf, .otf).  None means pygame's own default font.
+    @param size The font height in pixels.
+    """
+    key = (family, size, bold, italic)
+    font = _fonts.get(key)
+    if font is None:
+        init_font()
+        if family and (family.endswith(".ttf") or family.endswith(".otf")):
+            font = pygame.font.Font(family, size)
+            font.set_bold(bold)
+            font.set_italic(italic)
+        else:
+            font = pygame.font.SysFont(family, size, bold, italic)
+        _fonts[key] = font
+    return font
+
+def preload_fonts(*specs):
+    """
+    Look up fonts ahead of time, e.g. while the program starts, so that the
+    first say() or TextSprite doesn't pause.
+    @param specs Sizes for the default font, or tuples of arguments to
+           get_font(), e.g. preload_fonts(25, 50, ("serif", 40, False, True))
+    """
+    for spec in specs:
+        if isinstance(spec, tuple):
+            get_font(*spec)
+        else:
+            get_font(size=spec)
+
 def render_text(font, text, rect, color=color.BLACK, bgcolor=None, justification='left'):
     maxWidth = rect.w
     
@@ -74,7 +124,7 @@ class AskDialog(pygame.sprite.Sprite):
         scr = rect
         self.rect = pygame.Rect(10, scr.h-40, scr.w-20, 30)
         self._paddedText = self.rect.inflate(-15,-15)
-        self._font = pygame.font.SysFont("sans serif", 24)
+        self._font = get_font(size=24)
     
     def done(self):
         return self._doneFuture
@@ -0,0 +1,230 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+A TileMap draws a level from a grid of tile numbers and a sheet of tile
+images, instead of one huge backdrop or hundreds of sprites.  Add it to a
+stage, usually with a camera, and it is drawn behind the sprites:
+```
+level = TileMap.from_tiled("level1.json", solid={1, 2, 7})
+stage.add_tilemap(level)
+stage.camera.world = level.rect
+...
+if player.touching(level):
+    ...
+```
+The map is drawn in square chunks of tiles, each made into one surface the
+first time it comes into view, so drawing costs a few blits per frame no
+matter how big the map is.  Chunks far from the view are dropped when they
+take more memory than allowed.  Changing a tile redraws only its chunk.
+
+Collisions with a sprite use the tile grid and the sprite's rectangle, not
+masks, so they cost the same however big the map is.
+"""
+import collections
+import csv
+import json
+import os
+import pygame
+from scratchypy import image
+
+EMPTY = -1
+
+
+class TileMap:
+    CHUNK_TILES = 16 # chunks are this many tiles on each side
+    MAX_MEGABYTES = 64
+
+    def __init__(self, tiles, grid, tileWidth:int, tileHeight:int, solid=(),
+                 x:int=0, y:int=0, maxMegabytes:float=MAX_MEGABYTES):
+        """
+        @param tiles List of tile Surfaces, e.g. from image.load_sheet().
+        @param grid Rows of tile numbers: indexes into tiles, or EMPTY.
+        @param tileWidth, tileHeight Size of a tile in pixels.
+        @param solid Tile numbers that sprites collide with.
+        @param x, y World position of the top left of the map.
+        @param maxMegabytes How much memory chunk surfaces may take.
+        """
+        self._tiles = tiles
+        self._grid = [ list(row) for row in grid ]
+        self._rows = len(self._grid)
+        self._cols = max((len(row) for row in self._grid), default=0)
+        for row in self._grid: # make it rectangular
+            row.extend([EMPTY] * (self._cols - len(row)))
+        self._tileW = tileWidth
+        self._tileH = tileHeight
+        self._x = x
+        self._y = y
+        self.solid = set(solid)
+        self._maxBytes = maxMegabytes * 1024 * 1024
+        # (cx, cy) -> Surface, least recently drawn first
+        self._chunks = collections.OrderedDict()
+        self._bytes = 0
+        self._changes = 0 # set_tile() count, for a Layer to notice
+
+    @classmethod
+    def from_csv(cls, fileName, sheetFile, tileWidth:int, tileHeight:int, **kwargs):
+        """
+        Load a grid of comma separated tile numbers, counting from 0 in the
+        sheet and -1 for empty, like Tiled's CSV export.
+        @param sheetFile The tile sheet image, tiles in a grid with no gaps.
+        """
+        with open(fileName, newline='') as f:
+            grid = [ [int(v) for v in row] for row in csv.reader(f) if row ]
+        tiles = image.load_sheet(sheetFile, tileWidth, tileHeight)
+        return cls(tiles, grid, tileWidth, tileHeight, **kwargs)
+
+    @classmethod
+    def from_tiled(cls, fileName, layer:int=0, **kwargs):
+        """
+        Load a map saved as JSON by the Tiled editor.  Uses one tile layer
+        and the first tileset, which must be an image, not a collection.
+        Tile numbers are counted from 0 in that tileset.
+        """
+        with open(fileName) as f:
+            data = json.load(f)
+        tileLayers = [ l for l in data["layers"] if l.get("type", "tilelayer") == "tilelayer" ]
+        mapLayer = tileLayers[layer]
+        tileset = data["tilesets"][0]
+        folder = os.path.dirname(fileName)
+        if "source" in tileset: # external tileset file
+            with open(os.path.join(folder, tileset["source"])) as f:
+                firstgid = tileset["firstgid"]
+                tileset = json.load(f)
+                tileset["firstgid"] = firstgid
+        tiles = image.load_sheet(os.path.join(folder, tileset["image"]),
+                                 tileset["tilewidth"], tileset["tileheight"],
+                                 count=tileset.get("tilecount"),
+                                 margin=tileset.get("margin", 0),
+                                 spacing=tileset.get("spacing", 0))
+        width = mapLayer["width"]
+        firstgid = tileset["firstgid"]
+        # gid 0 is empty; high bits are flip flags, which are not supported
+        data = [ (gid & 0x0FFFFFFF) - firstgid if gid else EMPTY for gid in mapLayer["data"] ]
+        grid = [ data[i:i + width] for i in range(0, len(data), width) ]
+        return cls(tiles, grid, tileset["tilewidth"], tileset["tileheight"], **kwargs)
+
+    @property
+    def rect(self) -> pygame.Rect:
+        """ The world area the map covers """
+        return pygame.Rect(self._x, self._y, self._cols * self._tileW, self._rows * self._tileH)
+
+    @property
+    def size(self):
+        """ (columns, rows) of tiles """
+        return (self._cols, self._rows)
+
+    def get_tile(self, col:int, row:int) -> int:
+        """ @return the tile number, or EMPTY if outside the map """
+        if 0 <= row < self._rows and 0 <= col < self._cols:
+            return self._grid[row][col]
+        return EMPTY
+
+    def set_tile(self, col:int, row:int, tile:int):
+        """ Change a tile.  Only the chunk it is in is drawn again. """
+        if not (0 <= row < self._rows and 0 <= col < self._cols):
+            raise IndexError("No tile at column %d row %d" % (col, row))
+        if self._grid[row][col] == tile:
+            return
+        self._grid[row][col] = tile
+        self._changes += 1
+        n = self.CHUNK_TILES
+        chunk = self._chunks.get((col // n, row // n))
+        if chunk is not None:
+            x = (col % n) * self._tileW
+            y = (row % n) * self._tileH
+            chunk.fill((0, 0, 0, 0), (x, y, self._tileW, self._tileH))
+            if tile != EMPTY:
+                chunk.blit(self._tiles[tile], (x, y))
+
+    def cell_at(self, x:float, y:float):
+        """ @return the (col, row) of the tile at a world position """
+        return (int((x - self._x) // self._tileW), int((y - self._y) // self._tileH))
+
+    def tile_at(self, x:float, y:float) -> int:
+        """ @return the tile number at a world position, or EMPTY """
+        return self.get_tile(*self.cell_at(x, y))
+
+    def solid_at(self, x:float, y:float) -> bool:
+        return self.tile_at(x, y) in self.solid
+
+    def _cells_in(self, rect):
+        """ @return the range of (cols, rows) the rect covers, clipped to the map """
+        col0, row0 = self.cell_at(rect.left, rect.top)
+        col1, row1 = self.cell_at(rect.right - 1, rect.bottom - 1)
+        return (range(max(col0, 0), min(col1, self._cols - 1) + 1),
+                range(max(row0, 0), min(row1, self._rows - 1) + 1))
+
+    def solid_rects(self, rect) -> list:
+        """ @return the world rects of the solid tiles overlapping the rect """
+        cols, rows = self._cells_in(pygame.Rect(rect))
+        solid = self.solid
+        grid = self._grid
+        return [ pygame.Rect(self._x + c * self._tileW, self._y + r * self._tileH, self._tileW, self._tileH)
+                 for r in rows for c in cols if grid[r][c] in solid ]
+
+    def touching(self, rect) -> bool:
+        """ @return True if any solid tile overlaps the rect """
+        cols, rows = self._cells_in(pygame.Rect(rect))
+        solid = self.solid
+        grid = self._grid
+        return any(grid[r][c] in solid for r in rows for c in cols)
+
+    def _chunk(self, cx:int, cy:int) -> pygame.Surface:
+        key = (cx, cy)
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+        n = self.CHUNK_TILES
+        tw, th = self._tileW, self._tileH
+        chunk = image.normalize(pygame.Surface((n * tw, n * th), pygame.SRCALPHA))
+        chunk.fill((0, 0, 0, 0))
+        tiles = self._tiles
+        blits = []
+        for r in range(cy * n, min((cy + 1) * n, self._rows)):
+            row = self._grid[r]
+            y = (r - cy * n) * th
+            for c in range(cx * n, min((cx + 1) * n, self._cols)):
+                tile = row[c]
+                if tile != EMPTY:
+                    blits.append((tiles[tile], ((c - cx * n) * tw, y)))
+        chunk.blits(blits, doreturn=False)
+        self._chunks[key] = chunk
+        self._bytes += chunk.get_width() * chunk.get_height() * chunk.get_bytesize()
+        return chunk
+
+    def _evict(self, view):
+        """ Drop the chunks farthest from the view until under the cap. """
+        if self._bytes <= self._maxBytes:
+            return
+        n = self.CHUNK_TILES
+        cw, ch = n * self._tileW, n * self._tileH
+        vx = (view.centerx - self._x) / cw
+        vy = (view.centery - self._y) / ch
+        far = sorted(self._chunks, key=lambda k: (k[0] + 0.5 - vx) ** 2 + (k[1] + 0.5 - vy) ** 2, reverse=True)
+        for key in far:
+            if self._bytes <= self._maxBytes:
+                break
+            chunk = self._chunks.pop(key)
+            self._bytes -= chunk.get_width() * chunk.get_height() * chunk.get_bytesize()
+
+    def _render(self, screen, view, offset):
+        """
+        Draw the chunks that overlap the view.
+        @param view The world rect shown in the window.
+        @param offset (dx, dy) from world to screen coordinates.
+        """
+        n = self.CHUNK_TILES
+        cw, ch = n * self._tileW, n * self._tileH
+        area = view.clip(self.rect)
+        if not area.w or not area.h:
+            return
+        cx0 = (area.left - self._x) // cw
+        cx1 = (area.right - 1 - self._x) // cw
+        cy0 = (area.top - self._y) // ch
+        cy1 = (area.bottom - 1 - self._y) // ch
+        ox = self._x + offset[0]
+        oy = self._y + offset[1]
+        screen.blits([ (self._chunk(cx, cy), (ox + cx * cw, oy + cy * ch))
+                       for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1) ], doreturn=False)
+        self._evict(view)
@@ -0,0 +1,184 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Tweens smoothly change a sprite property (position, direction, size, or a
+graphic effect) over time.  Sprite.glide_to() and Sprite.tween() use them.
+
+All the tweens on a stage are advanced together in one pass each frame by
+the stage's TweenEngine, rather than each being its own asyncio task that
+wakes up every frame.  A Tween can still be awaited to wait until it is done:
+```
+await sprite.tween("size", 200, 1.5, easing="ease_out")
+```
+"""
+import asyncio
+import math
+
+#
+# EASING - functions of t in 0..1 that return 0..1
+#
+def linear(t):
+    return t
+
+def ease_in(t):
+    return t * t
+
+def ease_out(t):
+    return t * (2 - t)
+
+def ease_in_out(t):
+    return 2 * t * t if t < 0.5 else -1 + (4 - 2 * t) * t
+
+def ease_in_out_sine(t):
+    return 0.5 - math.cos(math.pi * t) / 2
+
+EASINGS = {
+    "linear": linear,
+    "ease_in": ease_in,
+    "ease_out": ease_out,
+    "ease_in_out": ease_in_out,
+    "sine": ease_in_out_sine,
+}
+
+#
+# PROPERTIES - (getter, setter) for what can be tweened
+#
+def _set_position(sprite, pos):
+    sprite._x, sprite._y = pos
+    sprite._moved()
+
+def _set_x(sprite, x):
+    sprite._x = x
+    sprite._moved()
+
+def _set_y(sprite, y):
+    sprite._y = y
+    sprite._moved()
+
+PROPERTIES = {
+    "position": (lambda sp: (sp._x, sp._y), _set_position),
+    "x": (lambda sp: sp._x, _set_x),
+    "y": (lambda sp: sp._y, _set_y),
+    "direction": (lambda sp: sp.direction, lambda sp, v: sp.point_in_direction(v)),
+    "size": (lambda sp: sp.size, lambda sp, v: sp.set_size_to(v)),
+}
+
+def _property(name):
+    prop = PROPERTIES.get(name)
+    if prop is None:
+        # any graphic effect, e.g. 'ghost'
+        from scratchypy import effects
+        effect = effects.check_name(name)
+        prop = (lambda sp: sp.get_effect(effect), lambda sp, v: sp.set_effect_to(effect, v))
+    return prop
+
+
+class Tween:
+    """
+    A handle to one running tween.  It can be awaited, cancelled, or
+    checked with done(), much like an asyncio Task.
+    """
+    def __init__(self, sprite, prop:str, target, frames:int, easing="linear"):
+        self._sprite = sprite
+        self._get, self._set = _property(prop)
+        self._prop = prop
+        self._target = target
+        self._isPair = isinstance(target, tuple)
+        start = self._get(sprite)
+        self._change = (target[0] - start[0], target[1] - start[1]) if self._isPair \
+            else target - start
+        self._frames = max(1, int(frames))
+        self._frame = 0
+        self._ease = easing if callable(easing) else EASINGS[easing]
+        self._eased = 0.0 # ease(t) at the previous step
+        self._done = False
+        self._cancelled = False
+        self._future = None # only made if someone awaits
+
+    def _step(self) -> bool:
+        """
+        Advance one frame.  Moves by the change in the eased amount rather
+        than setting an absolute value, so other motion at the same time
+        (another script, or another tween) adds up rather than fights.
+        The last frame lands exactly on the target.
+        @return True when finished.
+        """
+        self._frame += 1
+        if self._frame >= self._frames:
+            self._set(self._sprite, self._target)
+            self._finish()
+            return True
+        eased = self._ease(self._frame / self._frames)
+        d = eased - self._eased
+        self._eased = eased
+        cur = self._get(self._sprite)
+        if self._isPair:
+            self._set(self._sprite, (cur[0] + self._change[0] * d, cur[1] + self._change[1] * d))
+        else:
+            self._set(self._sprite, cur + self._change * d)
+        return False
+
+    def _finish(self):
+        self._done = True
+        if self._future is not None and not self._future.done():
+            self._future.set_result(None)
+
+    def done(self) -> bool:
+        return self._done
+
+    def cancel(self):
+        """ Stop where it is now.  Anyone awaiting gets CancelledError. """
+        if not self._done:
+            self._done = True
+            self._cancelled = True
+            if self._future is not None:
+                self._future.cancel()
+
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def __await__(self):
+        if self._done:
+            if self._cancelled:
+                raise asyncio.CancelledError()
+            return None
+        if self._future is None:
+            self._future = asyncio.get_running_loop().create_future()
+        return (yield from self._future.__await__())
+
+
+class TweenEngine:
+    """
+    Advances all the tweens of a stage, once per frame.
+    """
+    def __init__(self):
+        self._tweens = []
+
+    def __len__(self):
+        return len(self._tweens)
+
+    def add(self, tween:Tween) -> Tween:
+        self._tweens.append(tween)
+        return tween
+
+    def step(self):
+        if not self._tweens:
+            return
+        # Keep the ones still running.  Tweens added during this step (by
+        # code awaiting one that finished) start next frame.
+        tweens = self._tweens
+        self._tweens = []
+        running = [t for t in tweens if not t._done and not t._step()]
+        running.extend(self._tweens)
+        self._tweens = running
+
+    def cancel_sprite(self, sprite, prop:str=None):
+        """ Cancel the sprite's tweens, or just those of one property. """
+        for t in self._tweens:
+            if t._sprite is sprite and (prop is None or t._prop == prop):
+                t.cancel()
+
+    def cancel_all(self):
+        for t in self._tweens:
+            t.cancel()
+        self._tweens = []
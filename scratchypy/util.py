@@ -4,6 +4,7 @@
 Misc. utility functions.
 """
 import asyncio
+import functools
 import os
 import threading
 import datetime
@@ -36,6 +37,19 @@ def to_thread(uiFunc):
     uiFunc._to_thread = True
     return uiFunc
 
+def synchronized(lock):
+    """
+    Make a function hold the lock while it runs, for module caches that
+    preload_stage() also uses from its thread.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with lock:
+                return func(*args, **kwargs)
+        return inner
+    return decorate
+
 def ui_only(func):
     def inner():
         if not is_ui_thread():
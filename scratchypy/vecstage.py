@@ -0,0 +1,225 @@
+# Copyright 2024 Mark Malek
+# See LICENSE file for full license terms.
+"""
+Many stages at once with no window, for training agents and trying out
+settings.  Each stage runs in a process of its own, so they use all the
+CPU cores, and they all go forward together a step at a time:
+```
+import random
+from scratchypy import Sprite, Stage
+from scratchypy.vecstage import VecStage
+
+class Chase(Stage):
+    def on_init(self):
+        self.player = Sprite("player.png", stage=self)
+
+def act(stage, action):
+    stage.player.turn(action)
+    stage.player.move(5)
+    return stage.player.touching_edge() # e.g. a reward or done flag
+
+if __name__ == '__main__':
+    with VecStage(Chase, 8, act, frameSize=(84, 84)) as envs:
+        obs = envs.reset(seed=1)
+        for _ in range(1000):
+            obs, results = envs.step([ random.choice((-15, 15)) for _ in range(8) ])
+```
+The stage class or setup function and act() are given to the other
+processes, so they must be defined at the top level of a module, and the
+program must start them under `if __name__ == '__main__':`.
+
+Each step calls act(stage, action) for each stage, which may be async,
+then draws `frameSkip` frames with a fixed timestep, so waits and glides
+count frames just like in a window.  The observations are NumPy arrays
+with the stages stacked on the first axis:
+  - "sprites": (stages, maxSprites, len(SPRITE_FIELDS)) float32, the
+    sprites in layer order, padded with zeros;
+  - "counts": (stages,) how many sprites each stage has;
+  - "frames": (stages, height, width, 3) uint8 screens scaled to
+    frameSize, only if given.
+
+Needs NumPy.
+"""
+import inspect
+import multiprocessing
+import os
+import random
+import traceback
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SPRITE_FIELDS = ("x", "y", "direction", "size", "costume", "visible")
+MAX_SPRITES = 32
+CLOSE_SECONDS = 5
+
+
+def _make_stage(setup):
+    from scratchypy.stage import Stage
+    if isinstance(setup, type) and issubclass(setup, Stage):
+        return setup()
+    stage = Stage()
+    setup(stage)
+    return stage
+
+def _observe(window, maxSprites:int, frameSize):
+    """ @return (sprite states, sprite count, frame or None) of the window's stage """
+    sprites = window.stage._sprites
+    state = numpy.zeros((maxSprites, len(SPRITE_FIELDS)), numpy.float32)
+    for row, sp in zip(state, sprites):
+        row[:] = (sp._x, sp._y, sp.direction, sp._scale * 100, sp._costumeIndex, sp._visible)
+    frame = None
+    if frameSize is not None:
+        screen = pygame.display.get_surface()
+        if screen.get_size() != frameSize:
+            screen = pygame.transform.smoothscale(screen, frameSize)
+        frame = numpy.frombuffer(pygame.image.tobytes(screen, "RGB"), numpy.uint8) \
+            .reshape(frameSize[1], frameSize[0], 3)
+    return state, len(sprites), frame
+
+async def _serve(conn, window, setup, act, maxSprites, frameSize, frameSkip):
+    """ Script running in each process: do what the VecStage sends """
+    from scratchypy import next_frame
+    while True:
+        command, arg = conn.recv() # blocks the frames until told what to do
+        if command == "close":
+            break
+        try:
+            result = None
+            if command == "reset":
+                if arg is not None:
+                    random.seed(arg)
+                window.set_stage(_make_stage(setup))
+                frames = 1
+            else:
+                if act is not None:
+                    result = act(window.stage, arg)
+                    if inspect.isawaitable(result):
+                        result = await result
+                frames = frameSkip
+            for _ in range(frames):
+                await next_frame()
+            conn.send((True, result, _observe(window, maxSprites, frameSize)))
+        except Exception:
+            conn.send((False, traceback.format_exc(), None))
+    pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+def _worker(conn, setup, act, windowSize, maxSprites, frameSize, frameSkip):
+    """ The main function of each process, running one stage with no window """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    from scratchypy import get_window, scheduler, start
+    window = get_window()
+    window.set_fixed_timestep(True)
+    if windowSize is not None:
+        window.set_size(*windowSize)
+    scheduler.spawn(_serve(conn, window, setup, act, maxSprites, frameSize, frameSkip), name="vecstage")
+    try:
+        start()
+    except SystemExit:
+        pass
+    conn.close()
+
+
+class VecStage:
+    def __init__(self, setup, count:int, act=None, windowSize=None, frameSize=None,
+                 maxSprites:int=MAX_SPRITES, frameSkip:int=1):
+        """
+        Start the processes.  Their stages are made by reset().
+        @param setup A Stage subclass, or a function given a new Stage to
+               add sprites and handlers to.
+        @param count How many stages to run.
+        @param act Function (stage, action) called for each stage on
+               step(), or None.  What it returns is given back by step().
+        @param windowSize (w, h) of each stage's screen, default (800, 600).
+        @param frameSize (w, h) to scale screens to for the observations,
+               or None for no frames.
+        @param maxSprites How many sprites to give the state of, at most.
+        @param frameSkip How many frames to draw for each step.
+        """
+        if numpy is None:
+            raise ImportError("VecStage needs numpy: pip install numpy")
+        self._frameSize = tuple(frameSize) if frameSize is not None else None
+        self._reset = False
+        self._conns = []
+        self._processes = []
+        context = multiprocessing.get_context("spawn") # no copy of our pygame state
+        for i in range(count):
+            conn, childConn = context.Pipe()
+            process = context.Process(target=_worker, name="vecstage-%d" % i, daemon=True,
+                                      args=(childConn, setup, act, windowSize, maxSprites,
+                                            self._frameSize, frameSkip))
+            process.start()
+            childConn.close()
+            self._conns.append(conn)
+            self._processes.append(process)
+
+    @property
+    def count(self) -> int:
+        return len(self._conns)
+
+    def reset(self, seed:int=None) -> dict:
+        """
+        Make all the stages new, replacing the old ones.
+        @param seed If given, seeds the random module of stage i with seed + i.
+        @return the observations of their first frame.
+        """
+        for i, conn in enumerate(self._conns):
+            conn.send(("reset", seed + i if seed is not None else None))
+        self._reset = True
+        return self._gather()[0]
+
+    def step(self, actions):
+        """
+        Call act() with one action for each stage, and draw their frames.
+        @param actions A sequence with an action for each stage.
+        @return (observations, a list of what act() returned for each stage)
+        """
+        if not self._reset:
+            raise RuntimeError("Call reset() before step()")
+        if len(actions) != len(self._conns):
+            raise ValueError("Expected %d actions, got %d" % (len(self._conns), len(actions)))
+        # send all first, so that they all work at the same time
+        for conn, action in zip(self._conns, actions):
+            conn.send(("step", action))
+        return self._gather()
+
+    def _gather(self):
+        replies = []
+        for i, conn in enumerate(self._conns):
+            try:
+                replies.append(conn.recv())
+            except EOFError:
+                replies.append((False, "The process of stage %d ended" % i, None))
+        failed = [ (i, reply[1]) for i, reply in enumerate(replies) if not reply[0] ]
+        if failed:
+            raise RuntimeError("Stage %d failed:\n%s" % failed[0])
+        states, counts, frames = zip(*[ reply[2] for reply in replies ])
+        observations = { "sprites": numpy.stack(states), "counts": numpy.array(counts) }
+        if self._frameSize is not None:
+            observations["frames"] = numpy.stack(frames)
+        return observations, [ reply[1] for reply in replies ]
+
+    def close(self):
+        """ End the processes """
+        for conn in self._conns:
+            try:
+                conn.send(("close", None))
+            except OSError:
+                pass # already ended
+        for conn, process in zip(self._conns, self._processes):
+            process.join(CLOSE_SECONDS)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self._conns.clear()
+        self._processes.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
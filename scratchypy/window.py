@@ -8,12 +8,15 @@ import asyncio
 import time
 import sys
 import os
+import concurrent.futures
+import functools
 import pygame #todo try
 import pygame.key
 from pygame.locals import *
 
 import scratchypy.stage
-from scratchypy import color, util
+from scratchypy import color, util, replay, image, scheduler, recorder
+from scratchypy.version import __version__
 
 class _RollingAverage:
     """
@@ -37,6 +40,21 @@ class _RollingAverage:
         return sum(self._values) / self._numValues
     
 
+class _NextFrame:
+    """
+    Awaitable for the next frame.  Scripts run by the scheduler are resumed
+    directly by the window; anything else waits for the frame event.
+    """
+    __slots__ = ("_event",)
+    def __init__(self, event):
+        self._event = event
+        
+    def __await__(self):
+        if scheduler.get_scheduler().in_script():
+            return (yield from scheduler.NEXT_FRAME.__await__())
+        return (yield from self._event.wait().__await__())
+
+
 class Window:
     FPS=30
     FRAME_SEC = 1 / FPS
@@ -54,11 +72,23 @@ class Window:
         self._debug = False
         self._epoch = time.monotonic()
         self._frameDraw = asyncio.Event()
-        # title can be set before window
-        pygame.display.set_caption(os.path.basename(sys.argv[0]))
+        self._nextFrame = _NextFrame(self._frameDraw)
+        self._frameCount = 0
+        self._throttled = True
+        self._fixedStep = False
+        self._epochFrame = 0
+        self._recorder = None
+        self._input = replay.LiveInput()
+        # title can be set before window; applied when the display is made
+        self._title = os.path.basename(sys.argv[0])
         
     def set_debug(self, val=True):
+        """
+        Turn on asyncio debugging, and warnings for images that are slow to
+        draw.
+        """
         self._debug = val
+        image.set_blit_check(val)
         
     def set_size(self, width, height):
         """
@@ -68,7 +98,9 @@ class Window:
         self._windowSize=(width, height)
         
     def set_title(self, title):
-        pygame.display.set_caption(title)
+        self._title = title
+        if pygame.display.get_init():
+            pygame.display.set_caption(title)
         
     def set_fullscreen(self):
         self._fullScreen = True
@@ -76,16 +108,118 @@ class Window:
     def set_background_color(self, color:pygame.color.Color):
         self._backgroundColor = color
 
+    def set_throttled(self, throttled=True):
+        """
+        Normally frames are limited to the FPS rate.  If throttled is False,
+        frames are drawn as fast as possible instead.  Things that count
+        frames (next_frame(), glides, animations) stay the same, so this is
+        useful for replaying recorded input quickly.
+        """
+        self._throttled = throttled
+
+    def set_fixed_timestep(self, fixed=True):
+        """
+        Draw frames as fast as possible, and have the timer count frames
+        instead of real seconds, so that everything runs the same as at
+        normal speed, only sooner.  For recording and tests.
+        """
+        self._fixedStep = fixed
+        self.set_throttled(not fixed)
+
+    def record_frames(self, sink, realTime:bool=True, policy:str=recorder.BLOCK, queueSize:int=32):
+        """
+        Record every frame drawn, until stop_recording() or the end of the
+        program.  See the recorder module.
+        @param sink Where frames go, e.g. recorder.PngSequence("frames").
+        @param realTime If False, use set_fixed_timestep() to record faster
+               than real time.
+        @param policy recorder.BLOCK to slow down rather than lose frames,
+               recorder.DROP to skip frames when writing falls behind.
+        @return the recorder.FrameRecorder, which counts recorded and dropped
+                frames.
+        """
+        self.stop_recording()
+        self._recorder = recorder.FrameRecorder(sink, self.FPS, policy, queueSize)
+        if not realTime:
+            self.set_fixed_timestep(True)
+        return self._recorder
+
+    def stop_recording(self):
+        """ Finish writing the frames recorded so far. """
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+    def set_input(self, source):
+        """
+        [ADVANCED] Set where input events come from.  See the replay module
+        for the input source interface.  None restores live input.
+        """
+        self._input.close()
+        self._input = source if source is not None else replay.LiveInput()
+
+    def record_input(self, fileName:str):
+        """
+        Record all mouse and key input, stamped with frame numbers, to the
+        given file so that it can be replayed with replay_input().
+        """
+        self.set_input(replay.InputRecorder(fileName))
+
+    def replay_input(self, events, realTime:bool=True, quitAtEnd:bool=True):
+        """
+        Replay input recorded by record_input() instead of using the live
+        mouse and keyboard.
+        @param events A file name, or a list of (frame, event) tuples such as
+               from replay.click_storm().
+        @param realTime If False, frames are drawn as fast as possible.
+        @param quitAtEnd If True, the program exits on the frame after the
+               last event.
+        """
+        self.set_input(replay.InputReplayer(events, quitAtEnd=quitAtEnd))
+        self.set_throttled(realTime)
+
     @property
     def stage(self):
         return self._stage
     
-    def set_stage(self, newStage):
-        # cleanup old, but some events might still reference
+    def set_stage(self, newStage, keepOld:bool=False):
+        """
+        Switch to showing another stage.  A stage shown before, and kept,
+        continues where it was; a new one is started.
+        @param keepOld If True, the current stage is suspended so that it
+               can be switched back to, instead of destroyed.
+        """
         if self._stage:
-            self._stage.destroy()
+            if keepOld:
+                self._stage.suspend()
+            else:
+                self._stage.destroy()
         self._stage = newStage
-        self._stage._start()
+        if newStage._started:
+            newStage.resume()
+        else:
+            newStage._start()
+
+    def preload_stage(self, stageClass, *args, **kwargs):
+        """
+        Make a stage on a background thread while the current one runs, so
+        that its images are loaded by the time it is switched to:
+        ```
+        nextLevel = preload_stage(Level2)
+        ...
+        set_stage(await nextLevel)
+        ```
+        The stage's on_init() runs on the other thread, so it should only
+        make sprites and backdrops, not change the current stage.  The
+        image, effect and disk caches it fills have locks for this.
+        @param args, kwargs For the constructor of stageClass.
+        @return an awaitable future of the stage.
+        """
+        global _preloader
+        if _preloader is None:
+            _preloader = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="preload")
+        return asyncio.get_running_loop().run_in_executor(
+            _preloader, functools.partial(_make_stage, self._windowSize, stageClass, *args, **kwargs))
     
     @property
     def fps(self) -> int:
@@ -104,18 +238,31 @@ class Window:
         """
         return 1 / self._rollingFrameSec.average()
 
+    @property
+    def frame_number(self) -> int:
+        """
+        The number of frames drawn since the program started.
+        """
+        return self._frameCount
+
     @property
     def mouse_x(self):
-        return self._mousePos[0]
+        """ The x of mouse_pointer, in the world of the stage's camera if it has one. """
+        return self.mouse_pointer[0]
 
     @property
     def mouse_y(self):
-        return self._mousePos[1]
+        """ The y of mouse_pointer, in the world of the stage's camera if it has one. """
+        return self.mouse_pointer[1]
 
     @property
     def mouse_pointer(self):
-        "@return the position of the mouse pointer as an (x,y) tuple."
-        return self._mousePos
+        """
+        @return the position of the mouse pointer as an (x,y) tuple, in the
+                world of the stage's camera if it has one.
+        """
+        cam = self._stage._camera
+        return cam.to_world(self._mousePos) if cam is not None else self._mousePos
 
     #not a property?
     def mouse_down(self):
@@ -130,7 +277,7 @@ class Window:
                names is determined by the pygame.key module.
                Key can also be a pygame.K_* integer constant.
         """
-        boollist = pygame.key.get_pressed()
+        boollist = self._input.get_pressed()
         if key is None or key == 'any':
             return any(boollist)
         elif isinstance(key, str):
@@ -146,8 +293,14 @@ class Window:
     def random_position(self):
         """
         Pick a random position within the window and return it as an (x,y) pair.
+        If the stage's camera has world bounds, the position is anywhere in
+        the world instead.
         @return a tuple of an (x,y) coordinate
         """
+        cam = self._stage._camera
+        if cam is not None and cam.world is not None:
+            world = cam.world
+            return (random.randint(world.left, world.right), random.randint(world.top, world.bottom))
         x = random.randint(0, self._windowSize[0])
         y = random.randint(0, self._windowSize[1])
         return (x,y)
@@ -167,19 +320,29 @@ class Window:
         Like the Scratch 'timer' pseudo-variable, this will return the number
         of seconds (and fractional seconds) since the program was started.
         """
+        if self._fixedStep:
+            return (self._frameCount - self._epochFrame) * self.FRAME_SEC
         return time.monotonic() - self._epoch
     
     def reset_timer(self):
         self._epoch = time.monotonic()
+        self._epochFrame = self._frameCount
 
     def _make_screen(self, windowSize):
+        # Not pygame.init(): audio and joysticks are slow to start and are
+        # initialized on first use instead.  Fonts are cheap, and may be
+        # used directly in user code.
+        pygame.display.init()
+        pygame.font.init()
+        pygame.display.set_caption(self._title)
         winstyle = pygame.FULLSCREEN if self._fullScreen else 0
         bestdepth = pygame.display.mode_ok(self._windowSize, winstyle, 32)
         screen = pygame.display.set_mode(self._windowSize, winstyle, bestdepth)
+        image._display_created()
         return screen
 
     def _handleEvents(self):
-        for event in pygame.event.get():
+        for event in self._input.get_events(self._frameCount):
             if event.type == pygame.QUIT:
                 raise StopIteration() #TODO
             elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -210,7 +373,10 @@ class Window:
         # This limits the framerate, like tick(FPS), but also gives async
         # callbacks triggered by below events a chance to run within the same
         # frame.
-        againHandle = asyncio.get_running_loop().call_later(self.FRAME_SEC - fudge, self._async_tick, screen)
+        delay = self.FRAME_SEC - fudge if self._throttled else 0
+        againHandle = asyncio.get_running_loop().call_later(delay, self._async_tick, screen)
+        # wake everything waiting for this frame before drawing it
+        scheduler.get_scheduler().run_timers(self._frameCount + 1)
         
         try:
             self._handleEvents()
@@ -227,11 +393,17 @@ class Window:
             #TODO: stop and show dialog?
         
         # release anybody waiting for the next frame
+        self._frameCount += 1
+        if self._recorder is not None:
+            self._recorder.capture(screen, self._frameCount)
+        scheduler.get_scheduler().run_frame()
         self._frameDraw.set()
         self._frameDraw.clear()
         
     def run(self):
+        print("ScratchyPy " + __version__)
         screen = self._make_screen(self._windowSize)
+        self._running = True
         util.set_ui_thread()
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
@@ -240,6 +412,7 @@ class Window:
         loop.call_soon(self._stage._start)
         loop.call_soon(self._async_tick, screen)
         loop.run_forever()
+        scheduler.get_scheduler().close()
         # drain cancellations one at a time
         for task in asyncio.all_tasks(loop):
             task.cancel()
@@ -250,52 +423,86 @@ class Window:
             except Exception as ex:
                 print("Ignored exception while draining task %s: %s" % (task, ex))
         loop.close()
+        self.stop_recording()
+        self._input.close()
+        self._running = False
         
-    async def next_frame(self):
+    def next_frame(self):
         """ 
         Yields control until the next frame is drawn.
+        @return an awaitable, which gives True
         """
-        await self._frameDraw.wait()
+        return self._nextFrame
+
+def _make_stage(size, stageClass, *args, **kwargs):
+    stage = stageClass(*args, **kwargs)
+    stage._warm_up(size)
+    return stage
 
 ## Module functions
-_window = Window()
+_window = None
+_preloader = None # thread for preload_stage()
 def get_window():
     """
-    @return the one and only window.  None if start() hasn't been called.
+    @return the one and only window.  It is made on first use, unless one
+            was given to set_window() before that.
     """
+    global _window
+    if _window is None:
+        _window = Window()
     return _window
 
+def set_window(window:Window):
+    """
+    [ADVANCED] Use a Window constructed explicitly instead of the default
+    one.  Call this before making any sprites or stages, since they look up
+    the window for its size.
+    """
+    global _window
+    if _window is not None and _window._running:
+        raise RuntimeError("Can only be set before running")
+    _window = window
+
 def get_stage():
     return get_window().stage
 
-def set_stage(newStage):
+def set_stage(newStage, keepOld:bool=False):
     """
     Convenience to set the current stage on the window.
+    @see Window.set_stage
+    """
+    get_window().set_stage(newStage, keepOld)
+
+def preload_stage(stageClass, *args, **kwargs):
+    """
+    Convenience to make a stage in the background.
+    @see Window.preload_stage
     """
-    get_window().set_stage(newStage)
+    return get_window().preload_stage(stageClass, *args, **kwargs)
     
 
-async def next_frame():
+def next_frame():
     """ 
-    Yields control until the next frame is drawn.
+    Yields control until the next frame is drawn, when awaited.
     @return Always True so that this can be used in a cannonical 'forever' loop:
     ```
     while await next_frame():
         sprite.turn(1)
     ```
     """
-    await get_window().next_frame()
-    return True
+    return get_window().next_frame()
 
 async def wait(seconds=0):
     """
     Asynchronously wait for the given amount of time, in seconds.
     At minimum this will wait until the next frame.
+    The time is counted in frames, so whatever is waiting wakes up just
+    before a frame is drawn, together with anything else due then.
     """
     if seconds <= Window.FRAME_SEC:
         await next_frame()
     else:
-        await asyncio.sleep(seconds)
+        await scheduler.get_scheduler().sleep_frames(round(seconds / Window.FRAME_SEC))
 
 def start(whenStarted=None, 
           stage=None, 
@@ -323,20 +530,20 @@ def start(whenStarted=None,
            window background, default WHITE.
     @param asyncioDebug Advanced logging of Python asyncio calls.
     """
-    global _window
+    window = get_window()
     if windowSize:
-        _window.set_size(*windowSize)
+        window.set_size(*windowSize)
     if windowTitle:
-        _window.set_title(windowTitle)
+        window.set_title(windowTitle)
     if fullScreen:
-        _window.set_fullscreen()
+        window.set_fullscreen()
     if backgroundColor:
-        _window.set_background_color(backgroundColor)
+        window.set_background_color(backgroundColor)
     if stage is not None:
-        _window._stage = stage # don't start it yet until loop is made
+        window._stage = stage # don't start it yet until loop is made
     if whenStarted:
-        _window.stage.when_started(whenStarted)
+        window.stage.when_started(whenStarted)
     if asyncioDebug:
-        _window.set_debug(True)
-    _window.run()  #forever
+        window.set_debug(True)
+    window.run()  #forever
     sys.exit(0) # Explicit to close window in Thonny